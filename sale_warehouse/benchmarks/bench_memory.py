@@ -0,0 +1,127 @@
+# bench_memory.py
+"""
+Memory budget of the dtype policy (etl/dtypes.py): bytes of every source
+frame and of the dimension and fact frames with the parser-default dtypes
+and with the compact dtypes.
+
+Run from the sale_warehouse directory, on the bundled sources or on one
+generated snapshot (see generate_data.py):
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --data bench_data/snapshot_0 --columns
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from pandas.api.types import is_string_dtype
+from bench_pipeline import configure, link_snapshot
+
+MB = 1024 * 1024
+
+
+def plain_dtypes(schema):
+    """
+    Declared source dtypes without the policy: text as object (what pandas
+    before 3.0 gives for "str"), integers as int64.
+    """
+    return {
+        col: "int64" if dtype.lower() in ("int32", "int64") else dtype if dtype == "float64" else object
+        for col, dtype in schema["dtype"].items()
+    }
+
+
+def read_plain(name):
+    """
+    One source as extract.read_source parsed it before the dtype policy.
+    """
+    import pandas as pd
+    from etl.extract import read_csv, get_parser_engine
+    from etl.schemas import SOURCE_SCHEMAS
+
+    schema = SOURCE_SCHEMAS[name]
+    df = read_csv(schema["path"], dtype=plain_dtypes(schema), engine=get_parser_engine())
+    for col, fmt in schema["dates"].items():
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=fmt, errors='coerce')
+    return df
+
+
+def as_object(df):
+    """
+    Text columns as object, the layout of the transforms before the policy.
+    """
+    return df.astype({col: object for col in df.columns if is_string_dtype(df[col]) and df[col].dtype != object})
+
+
+def transform_all(sources):
+    """
+    Initial-load transforms of the four warehouse frames.
+    """
+    from etl.transform import transform_dim_customer, transform_dim_product, transform_dim_date, transform_fact_sales
+
+    customer, _ = transform_dim_customer(sources["customer"], sources["customer_location"], sources["customer_info"])
+    product, _ = transform_dim_product(sources["product_info"], sources["product_categories"])
+    return {
+        "dim_customer": as_object(customer),
+        "dim_product": as_object(product),
+        "dim_date": as_object(transform_dim_date()),
+        "fact_sales": as_object(transform_fact_sales(sources["sales_details"], customer, product)),
+    }
+
+
+def print_report(name, report, columns):
+    total = report.loc["TOTAL"]
+    print(
+        f"  {name:<22}{total['bytes_before'] / MB:10.2f} MB{total['bytes_after'] / MB:10.2f} MB"
+        f"{total['ratio']:9.0%}"
+    )
+    if columns:
+        print(report.drop(index="TOTAL").to_string(max_colwidth=24))
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', help='directory with the six source files (default: the configured data directory)')
+    parser.add_argument('--work-dir', default='bench_work', help='scratch directory for keys and lookups')
+    parser.add_argument('--columns', action='store_true', help='print bytes per column')
+    args = parser.parse_args()
+
+    data = args.data or config.DATA_DIR
+    link_snapshot(data, configure(args.work_dir, "sqlite", "executemany", staging=False))
+    config.COMPACT_DTYPES = True
+
+    from etl import dtypes
+    from etl.extract import extract_sources
+    from etl.schemas import SOURCE_ORDER
+
+    print(f"{'':<24}{'default':>13}{'compact':>13}{'ratio':>9}")
+    before_total = after_total = 0
+
+    print("Sources")
+    compact = extract_sources(SOURCE_ORDER)
+    plain = {name: read_plain(name) for name in SOURCE_ORDER}
+    for name in SOURCE_ORDER:
+        report = dtypes.memory_report(plain[name], compact[name])
+        print_report(name, report, args.columns)
+        before_total += report.loc["TOTAL", "bytes_before"]
+        after_total += report.loc["TOTAL", "bytes_after"]
+
+    print("Warehouse frames")
+    dtypes.COMPACT_DTYPES = False
+    frames = transform_all(plain)
+    dtypes.COMPACT_DTYPES = True
+    for name, df in frames.items():
+        report = dtypes.memory_report(df, dtypes.compact_frame(df))
+        print_report(name, report, args.columns)
+        before_total += report.loc["TOTAL", "bytes_before"]
+        after_total += report.loc["TOTAL", "bytes_after"]
+
+    print(f"Total: {before_total / MB:.2f} MB -> {after_total / MB:.2f} MB ({after_total / before_total:.0%})")
+
+
+if __name__ == "__main__":
+    main()
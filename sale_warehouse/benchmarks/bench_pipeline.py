@@ -0,0 +1,227 @@
+# bench_pipeline.py
+"""
+End-to-end pipeline benchmark: time and peak memory of every extract,
+transform and load stage, over one or more source snapshots loaded in order
+into a fresh warehouse (the first snapshot is the initial load, later ones
+are incremental runs).
+
+Generate the data first (see generate_data.py), then run from the
+sale_warehouse directory:
+    python benchmarks/bench_pipeline.py --data bench_data --backend sqlite --json results.json
+    python benchmarks/bench_pipeline.py --data bench_data --baseline results.json
+
+With --baseline the run fails (exit code 1) when a stage is slower than the
+baseline by more than --tolerance.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+SOURCE_FILES = {
+    "CUSTOMER_CSV": "customer.csv",
+    "CUSTOMER_LOCATION_CSV": "customer_location.csv",
+    "CUSTOMER_INFO_CSV": "customer_info.csv",
+    "PRODUCT_CATEGORIES_CSV": "product_categories.csv",
+    "PRODUCT_INFO_CSV": "product_info.csv",
+    "SALES_DETAILS_CSV": "sales_details.csv",
+}
+MIN_COMPARED_SECONDS = 0.25  # shorter stages are too noisy to flag
+
+
+# ----------------------------
+# Isolated configuration
+# ----------------------------
+def configure(work_dir, backend, strategy, staging):
+    """
+    Point sources and every piece of local state at work_dir. Must run before
+    the etl modules are imported: they copy the config constants at import.
+    """
+    shutil.rmtree(work_dir, ignore_errors=True)
+    data_dir = os.path.join(work_dir, "data")
+    os.makedirs(data_dir)
+
+    config.DATA_DIR = data_dir
+    for name, file_name in SOURCE_FILES.items():
+        setattr(config, name, os.path.join(data_dir, file_name))
+
+    config.DB_BACKEND = backend
+    config.LOAD_STRATEGY = strategy
+    config.STAGING_CACHE_ENABLED = staging
+    config.SQLITE_DB_FILE = os.path.join(work_dir, "warehouse.sqlite")
+    config.DUCKDB_DB_FILE = os.path.join(work_dir, "warehouse.duckdb")
+    config.TRACKER_FILE = os.path.join(work_dir, "incremental_tracker.json")
+    config.KEY_STATE_FILE = os.path.join(work_dir, "surrogate_keys.json")
+    config.MANIFEST_FILE = os.path.join(work_dir, "source_manifest.json")
+    for name in ["STAGING_DIR", "STAGE_CACHE_DIR", "SNAPSHOT_DIR", "LOOKUP_DIR", "BULK_LOAD_DIR"]:
+        setattr(config, name, os.path.join(work_dir, name.lower().replace("_dir", "")))
+    return data_dir
+
+
+def link_snapshot(snapshot_dir, data_dir):
+    """
+    Expose one snapshot's files under the configured source paths.
+    """
+    for file_name in SOURCE_FILES.values():
+        target = os.path.join(data_dir, file_name)
+        if os.path.lexists(target):
+            os.remove(target)
+        source = os.path.abspath(os.path.join(snapshot_dir, file_name))
+        try:
+            os.symlink(source, target)
+        except OSError:
+            shutil.copy(source, target)
+
+
+# ----------------------------
+# Stage measurement
+# ----------------------------
+class StageTimer:
+    """
+    Collects wall time and peak traced memory per stage.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.results = []
+        if trace_memory:
+            tracemalloc.start()
+
+    def run(self, snapshot, stage, func, *args, **kwargs):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        peak_mb = None
+        if self.trace_memory:
+            peak_mb = (tracemalloc.get_traced_memory()[1] - base) / (1024 * 1024)
+
+        self.results.append({"snapshot": snapshot, "stage": stage, "seconds": seconds, "peak_mb": peak_mb})
+        memory = f"{peak_mb:10.1f} MB" if peak_mb is not None else ""
+        print(f"  {stage:<24}{seconds:10.3f}s{memory}")
+        return result
+
+
+def run_snapshot(timer, snapshot):
+    """
+    One pipeline run, stage by stage, in the order of main.run_etl.
+    """
+    from etl.extract import extract_all
+    from etl.transform import transform_dim_customer, transform_dim_product, transform_dim_date, transform_fact_sales
+    from etl.load import load_dim_customer, load_dim_product, load_dim_date, load_fact_sales
+    from etl.utils import get_dim_customer_current, get_dim_product_current
+    from etl.incremental import get_fact_hwm, select_new_sales
+    from main import fact_dimension
+
+    dim_customer_current = timer.run(snapshot, "read_dim_customer", get_dim_customer_current)
+    dim_product_current = timer.run(snapshot, "read_dim_product", get_dim_product_current)
+
+    customer, customer_loc, customer_info, product_cat, product_info, sales = timer.run(
+        snapshot, "extract_all", extract_all
+    )
+
+    dim_customer_new, dim_customer_current = timer.run(
+        snapshot, "transform_dim_customer", transform_dim_customer,
+        customer, customer_loc, customer_info, dim_customer_current=dim_customer_current
+    )
+    dim_product_new, dim_product_current = timer.run(
+        snapshot, "transform_dim_product", transform_dim_product,
+        product_info, product_cat, dim_product_current=dim_product_current
+    )
+    dim_date = timer.run(snapshot, "transform_dim_date", transform_dim_date)
+
+    fact_sales = timer.run(
+        snapshot, "transform_fact_sales", transform_fact_sales,
+        select_new_sales(sales, get_fact_hwm()),
+        fact_dimension(config.DIM_CUSTOMER_TABLE, dim_customer_current, dim_customer_new),
+        fact_dimension(config.DIM_PRODUCT_TABLE, dim_product_current, dim_product_new)
+    )
+
+    timer.run(snapshot, "load_dim_customer", load_dim_customer, dim_customer_new, dim_customer_current)
+    timer.run(snapshot, "load_dim_product", load_dim_product, dim_product_new, dim_product_current)
+    timer.run(snapshot, "load_dim_date", load_dim_date, dim_date)
+    timer.run(snapshot, "load_fact_sales", load_fact_sales, fact_sales)
+
+
+# ----------------------------
+# Regression check
+# ----------------------------
+def compare(results, baseline_file, tolerance):
+    """
+    Stages slower than the baseline by more than `tolerance`.
+    """
+    with open(baseline_file, "r") as f:
+        baseline = {(r["snapshot"], r["stage"]): r for r in json.load(f)["stages"]}
+
+    regressions = []
+    for r in results:
+        old = baseline.get((r["snapshot"], r["stage"]))
+        if old is None or old["seconds"] < MIN_COMPARED_SECONDS:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append((r, old, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='generated data directory (snapshot_<k> subdirectories) or one snapshot')
+    parser.add_argument('--work-dir', default='bench_work', help='scratch directory for the warehouse and local state')
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'duckdb', 'mssql'])
+    parser.add_argument('--strategy', default='executemany', choices=['executemany', 'multi', 'bulk'])
+    parser.add_argument('--staging', action='store_true', help='keep the Parquet staging cache enabled')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc (lower overhead, no peak memory)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown per stage (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    snapshots = sorted(glob.glob(os.path.join(args.data, "snapshot_*")), key=lambda d: int(d.rsplit("_", 1)[1]))
+    snapshots = snapshots or [args.data]
+
+    data_dir = configure(args.work_dir, args.backend, args.strategy, args.staging)
+    timer = StageTimer(trace_memory=not args.no_memory)
+
+    total_start = time.perf_counter()
+    for i, snapshot_dir in enumerate(snapshots):
+        print(f"Snapshot {i}: {snapshot_dir}")
+        link_snapshot(snapshot_dir, data_dir)
+        run_snapshot(timer, i)
+    total = time.perf_counter() - total_start
+    print(f"Total: {total:.3f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "backend": args.backend,
+                "strategy": args.strategy,
+                "data": os.path.abspath(args.data),
+                "total_seconds": total,
+                "stages": timer.results,
+            }, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(timer.results, args.baseline, args.tolerance)
+        for r, old, ratio in regressions:
+            print(
+                f"REGRESSION snapshot {r['snapshot']} {r['stage']}: "
+                f"{old['seconds']:.3f}s -> {r['seconds']:.3f}s ({ratio:.2f}x)"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"No stage slower than the baseline by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+# generate_data.py
+"""
+Generate synthetic ERP/CRM source CSVs at a configurable scale, with the
+same layout and key quirks as the sample files in data/:
+
+- customer.csv CIDs partly carry the 'NAS' prefix
+- customer_location.csv CIDs are hyphenated ('AW-00011000')
+- product keys start with the category prefix ('CO-RF-FR-R92B-58'), sales
+  reference them without it ('FR-R92B-58')
+- untrimmed names, mixed gender / country codes, blank costs and prices,
+  a few invalid YYYYMMDD sales dates and duplicate customer rows
+
+Each snapshot is a full source extract. Between consecutive snapshots
+`--change-rate` of the customers change a tracked attribute, the same share
+of products gets a new cost version, and `--sales-growth` new order lines
+are appended after the previous ones.
+
+Run from the sale_warehouse directory:
+    python benchmarks/generate_data.py --customers 1000000 --sales 50000000 --out bench_data
+    python benchmarks/generate_data.py --customers 100000 --sales 1000000 --snapshots 3 --out bench_data
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PRODUCT_CATEGORIES_CSV
+
+FIRST_NAMES = np.array([
+    "Jon", "Eugene", "Ruben", "Christy", "Elizabeth", "Julio", "Janet", "Marco", "Rob", "Shannon",
+    "Jacquelyn", "Curtis", "Lauren", "Ian", "Sydney", "Chloe", "Wyatt", "Shannon", "Clarence", "Luke",
+])
+LAST_NAMES = np.array([
+    "Yang", "Huang", "Torres", "Zhu", "Johnson", "Ruiz", "Alvarez", "Mehta", "Verhoff", "Carlson",
+    "Suarez", "Lu", "Walker", "Jenkins", "Bennett", "Young", "Hill", "Wang", "Lee", "Anderson",
+])
+COUNTRIES = np.array([
+    "Australia", "Canada", "DE", "France", "Germany", "US", "USA", "United Kingdom", "United States", "",
+])
+GENDERS = np.array(["Male", "Female", "M", "F", ""])
+PRODUCT_LINES = np.array(["M ", "R ", "S ", "T ", ""])
+COLORS = np.array(["Black", "Red", "Silver", "Blue", "Yellow"])
+SIZES = np.array(["38", "40", "42", "44", "48", "52", "56", "58", "62", "S", "M", "L", ""])
+
+CUSTOMER_ID_START = 11000
+ORDER_NUM_START = 43697
+SALES_START = pd.Timestamp("2010-12-29")
+SALES_DAYS = 3 * 365  # order dates of the first snapshot
+SNAPSHOT_DAYS = 30  # order dates added per later snapshot
+CHUNK_ROWS = 1_000_000  # sales lines written per append
+SEED_BLOCK = 10_000  # sales lines drawn per random stream, so snapshots share their prefix
+
+
+def _rng(seed, *stream):
+    return np.random.default_rng([seed, *stream])
+
+
+def _yyyymmdd(day_offsets):
+    """
+    YYYYMMDD integers for day offsets from SALES_START, through a per-day
+    table instead of formatting every row.
+    """
+    days = pd.Series(pd.date_range(SALES_START, periods=int(day_offsets.max()) + 1, freq="D"))
+    table = (days.dt.year * 10000 + days.dt.month * 100 + days.dt.day).to_numpy()
+    return table[day_offsets]
+
+
+def _untrimmed(values, rng, rate=0.05):
+    """
+    Pad a share of the strings with a leading or trailing blank.
+    """
+    values = values.astype(object)
+    pad = rng.random(len(values))
+    values[pad < rate / 2] = " " + values[pad < rate / 2]
+    values[(pad >= rate / 2) & (pad < rate)] = values[(pad >= rate / 2) & (pad < rate)] + " "
+    return values
+
+
+# ----------------------------
+# Customers
+# ----------------------------
+def customer_attributes(n, snapshot, change_rate, seed):
+    """
+    Tracked customer attributes as of a snapshot: the base draw plus the
+    changes of every snapshot up to it.
+    """
+    rng = _rng(seed, 1)
+    attrs = pd.DataFrame({
+        "first": FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), n)],
+        "last": LAST_NAMES[rng.integers(0, len(LAST_NAMES), n)],
+        "marital": np.where(rng.random(n) < 0.5, "M", "S"),
+        "country": COUNTRIES[rng.integers(0, len(COUNTRIES), n)],
+    })
+    for s in range(1, snapshot + 1):
+        step = _rng(seed, 2, s)
+        changed = step.random(n) < change_rate
+        k = int(changed.sum())
+        attrs.loc[changed, "last"] = LAST_NAMES[step.integers(0, len(LAST_NAMES), k)]
+        attrs.loc[changed, "marital"] = np.where(attrs.loc[changed, "marital"] == "M", "S", "M")
+        attrs.loc[changed, "country"] = COUNTRIES[step.integers(0, len(COUNTRIES) - 1, k)]
+    return attrs
+
+
+def write_customers(out_dir, n, snapshot, change_rate, seed):
+    rng = _rng(seed, 3)
+    ids = np.arange(CUSTOMER_ID_START, CUSTOMER_ID_START + n)
+    keys = pd.Series(ids).map(lambda i: f"AW{i:08d}")
+    attrs = customer_attributes(n, snapshot, change_rate, seed)
+
+    birth = SALES_START - pd.to_timedelta(rng.integers(18 * 365, 80 * 365, n), unit="D")
+    create = SALES_START + pd.to_timedelta(rng.integers(0, 5 * 365, n), unit="D")
+
+    # ERP customer: 60% carry the NAS prefix, a few have no birth date
+    erp_cid = np.where(rng.random(n) < 0.6, "NAS" + keys, keys)
+    bdate = pd.Series(birth.strftime("%Y-%m-%d")).where(rng.random(n) > 0.001, "")
+    pd.DataFrame({
+        "CID": erp_cid,
+        "BDATE": bdate,
+        "GEN": GENDERS[rng.choice(len(GENDERS), n, p=[0.45, 0.45, 0.02, 0.02, 0.06])],
+    }).to_csv(os.path.join(out_dir, "customer.csv"), index=False)
+
+    # ERP location: hyphenated CIDs
+    pd.DataFrame({
+        "CID": "AW-" + keys.str[2:],
+        "CNTRY": attrs["country"],
+    }).to_csv(os.path.join(out_dir, "customer_location.csv"), index=False)
+
+    # CRM customer info: untrimmed names, short codes, a few duplicate keys
+    info = pd.DataFrame({
+        "cst_id": ids,
+        "cst_key": keys,
+        "cst_firstname": _untrimmed(attrs["first"].to_numpy(), rng),
+        "cst_lastname": _untrimmed(attrs["last"].to_numpy(), rng),
+        "cst_marital_status": attrs["marital"],
+        "cst_gndr": np.array(["M", "F", ""])[rng.choice(3, n, p=[0.47, 0.47, 0.06])],
+        "cst_create_date": create.strftime("%Y-%m-%d"),
+    })
+    duplicates = info.sample(frac=0.001, random_state=seed)
+    pd.concat([info, duplicates], ignore_index=True).to_csv(
+        os.path.join(out_dir, "customer_info.csv"), index=False
+    )
+
+
+# ----------------------------
+# Products
+# ----------------------------
+def product_catalog(n, snapshot, change_rate, seed):
+    """
+    Product versions as of a snapshot: every product starts with one version,
+    each later snapshot adds a new cost version for `change_rate` of them.
+    """
+    categories = pd.read_csv(PRODUCT_CATEGORIES_CSV)["ID"].to_numpy()
+    rng = _rng(seed, 4)
+
+    index = np.arange(n)
+    category = categories[rng.integers(0, len(categories), n)]
+    model = [f"{chr(65 + i % 26)}{i // 26:03d}{chr(65 + (i * 7) % 26)}" for i in index]
+    size = SIZES[rng.integers(0, len(SIZES), n)]
+    sales_key = np.array([
+        f"{c[:2]}-{m}-{s}" if s else f"{c[:2]}-{m}" for c, m, s in zip(category, model, size)
+    ])
+    # 4 or 5 part product keys: category prefix + the key used on the sales side
+    prd_key = np.char.add(np.char.add(np.char.replace(category.astype(str), "_", "-"), "-"), sales_key)
+    name = np.array([f"Product {m} - {c}" for m, c in zip(model, COLORS[index % len(COLORS)])])
+
+    versions = pd.DataFrame({
+        "product": index,
+        "prd_key": prd_key,
+        "sales_key": sales_key,
+        "prd_nm": name,
+        "prd_cost": np.where(rng.random(n) < 0.01, np.nan, rng.integers(1, 2000, n)).astype(float),
+        "prd_line": PRODUCT_LINES[rng.integers(0, len(PRODUCT_LINES), n)],
+        "prd_start_dt": SALES_START - pd.to_timedelta(rng.integers(0, 3 * 365, n), unit="D"),
+    })
+    frames = [versions]
+    for s in range(1, snapshot + 1):
+        step = _rng(seed, 5, s)
+        changed = versions[step.random(n) < change_rate].copy()
+        changed["prd_cost"] = step.integers(1, 2000, len(changed)).astype(float)
+        changed["prd_start_dt"] = SALES_START + pd.Timedelta(days=SALES_DAYS + s * SNAPSHOT_DAYS)
+        frames.append(changed)
+    catalog = pd.concat(frames, ignore_index=True)
+    catalog.insert(0, "prd_id", np.arange(200, 200 + len(catalog)))
+    return catalog
+
+
+def write_products(out_dir, catalog):
+    df = catalog.sort_values(["prd_key", "prd_start_dt"]).copy()
+    # Source end dates are unreliable (some end before they start); the
+    # transform derives them from the next version's start date
+    df["prd_end_dt"] = df.groupby("prd_key")["prd_start_dt"].shift(-1) - pd.Timedelta(days=1)
+    df["prd_cost"] = df["prd_cost"].map(lambda v: "" if pd.isna(v) else str(int(v)))
+    df["prd_start_dt"] = df["prd_start_dt"].dt.strftime("%Y-%m-%d")
+    df["prd_end_dt"] = df["prd_end_dt"].dt.strftime("%Y-%m-%d").fillna("")
+    df.sort_values("prd_id")[
+        ["prd_id", "prd_key", "prd_nm", "prd_cost", "prd_line", "prd_start_dt", "prd_end_dt"]
+    ].to_csv(os.path.join(out_dir, "product_info.csv"), index=False)
+
+
+# ----------------------------
+# Sales
+# ----------------------------
+def sales_rows(n_sales, snapshot, sales_growth):
+    """
+    Order lines in a snapshot: the first snapshot plus the growth of each later one.
+    """
+    return n_sales + snapshot * int(n_sales * sales_growth)
+
+
+def sales_chunk(start, stop, n_sales, sales_growth, customers, sales_keys, prices, seed):
+    """
+    Order lines start..stop-1. Two lines per order, on two different
+    products, so (sls_ord_num, sls_prd_key) is unique like in the source;
+    order dates increase with the line number, so later snapshots only
+    append newer orders.
+    """
+    line = np.arange(start, stop)
+    n = len(line)
+
+    # Random draws come in fixed blocks of lines, independent of the snapshot size;
+    # from the order's first line on, which picks the product of both lines
+    first = start - start % 2
+    blocks = range(first // SEED_BLOCK, (stop - 1) // SEED_BLOCK + 1)
+    draws = np.concatenate([_rng(seed, 6, b).random((5, SEED_BLOCK)) for b in blocks], axis=1)
+    offset = first - blocks[0] * SEED_BLOCK
+    order_draw = draws[0, offset + (line - first) - line % 2]
+    u = draws[:, offset + start - first:offset + start - first + n]
+
+    # Line j belongs to snapshot 0 while j < n_sales, then to blocks of growth
+    growth = max(int(n_sales * sales_growth), 1)
+    in_base = line < n_sales
+    day = np.where(
+        in_base,
+        line * SALES_DAYS // max(n_sales, 1),
+        SALES_DAYS + (line - n_sales) // growth * SNAPSHOT_DAYS + (line - n_sales) % growth * SNAPSHOT_DAYS // growth
+    )
+    order_key = _yyyymmdd(day)
+    ship_key = _yyyymmdd(day + 7)
+    due_key = _yyyymmdd(day + 12)
+
+    product = ((order_draw * len(sales_keys)).astype(int) + line % 2) % len(sales_keys)
+    quantity = 1 + (u[1] * 4).astype(int)
+    price = prices[product]
+
+    broken = u[2]
+    order_key = np.where(broken < 0.0003, 0, order_key)
+    order_key = np.where((broken >= 0.0003) & (broken < 0.0005), order_key // 1000, order_key)
+
+    sales_amount = (quantity * price).astype(object)
+    price = price.astype(object)
+    blanks = u[3]
+    price[blanks < 0.001] = ""
+    sales_amount[(blanks >= 0.001) & (blanks < 0.002)] = ""
+
+    return pd.DataFrame({
+        "sls_ord_num": "SO" + pd.Series(ORDER_NUM_START + line // 2).astype(str),
+        "sls_prd_key": sales_keys[product],
+        "sls_cust_id": customers[(u[4] * len(customers)).astype(int)],
+        "sls_order_dt": order_key,
+        "sls_ship_dt": ship_key,
+        "sls_due_dt": due_key,
+        "sls_sales": sales_amount,
+        "sls_quantity": quantity,
+        "sls_price": price,
+    })
+
+
+def write_sales(out_dir, n_customers, n_sales, snapshot, sales_growth, catalog, seed):
+    customers = np.arange(CUSTOMER_ID_START, CUSTOMER_ID_START + n_customers)
+    base = catalog.drop_duplicates("product")
+    sales_keys = base["sales_key"].to_numpy()
+    prices = (base["prd_cost"].fillna(10).to_numpy() * 1.5).astype(int)
+
+    path = os.path.join(out_dir, "sales_details.csv")
+    total = sales_rows(n_sales, snapshot, sales_growth)
+    for start in range(0, total, CHUNK_ROWS):
+        chunk = sales_chunk(
+            start, min(start + CHUNK_ROWS, total), n_sales, sales_growth,
+            customers, sales_keys, prices, seed
+        )
+        chunk.to_csv(path, index=False, mode="w" if start == 0 else "a", header=start == 0)
+    return total
+
+
+# ----------------------------
+# Entry point
+# ----------------------------
+def generate(out_dir, customers, products, sales, snapshots=1, change_rate=0.02, sales_growth=0.05, seed=42):
+    """
+    Write `snapshots` consistent source extracts to out_dir/snapshot_<k>.
+
+    Returns:
+        list of snapshot directories
+    """
+    import shutil
+
+    dirs = []
+    for s in range(snapshots):
+        snap_dir = os.path.join(out_dir, f"snapshot_{s}")
+        os.makedirs(snap_dir, exist_ok=True)
+        start = time.perf_counter()
+
+        shutil.copy(PRODUCT_CATEGORIES_CSV, os.path.join(snap_dir, "product_categories.csv"))
+        write_customers(snap_dir, customers, s, change_rate, seed)
+        catalog = product_catalog(products, s, change_rate, seed)
+        write_products(snap_dir, catalog)
+        n_sales = write_sales(snap_dir, customers, sales, s, sales_growth, catalog, seed)
+
+        print(
+            f"{snap_dir}: {customers} customers, {len(catalog)} product versions, "
+            f"{n_sales} sales lines ({time.perf_counter() - start:.1f}s)"
+        )
+        dirs.append(snap_dir)
+    return dirs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default='bench_data', help='output directory')
+    parser.add_argument('--customers', type=int, default=18_484)
+    parser.add_argument('--products', type=int, default=295)
+    parser.add_argument('--sales', type=int, default=60_398, help='order lines in the first snapshot')
+    parser.add_argument('--snapshots', type=int, default=1, help='number of successive source extracts')
+    parser.add_argument('--change-rate', type=float, default=0.02, help='share of customers/products changed per snapshot')
+    parser.add_argument('--sales-growth', type=float, default=0.05, help='new order lines per snapshot, as a share of --sales')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    generate(
+        args.out, args.customers, args.products, args.sales, args.snapshots,
+        args.change_rate, args.sales_growth, args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
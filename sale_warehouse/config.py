@@ -14,6 +14,41 @@ PRODUCT_CATEGORIES_CSV = os.path.join(DATA_DIR, "product_categories.csv")
 PRODUCT_INFO_CSV = os.path.join(DATA_DIR, "product_info.csv")
 SALES_DETAILS_CSV = os.path.join(DATA_DIR, "sales_details.csv")
 
+# ----------------------------
+# Extraction
+# ----------------------------
+EXTRACT_WORKERS = 6  # source files read concurrently
+EXTRACT_ENGINE = "pyarrow"  # "pyarrow" (multithreaded, optional dependency) or "c"
+
+# ----------------------------
+# Staging Cache (parsed sources as Parquet, needs pyarrow)
+# ----------------------------
+STAGING_CACHE_ENABLED = True
+STAGING_DIR = os.path.join(BASE_DIR, "staging")
+STAGING_CACHE_MAX_MB = 1024  # least recently used entries are evicted beyond this
+
+# ----------------------------
+# Stage Cache (transform outputs as Parquet keyed on input fingerprints, needs pyarrow)
+# ----------------------------
+STAGE_CACHE_ENABLED = True
+STAGE_CACHE_DIR = os.path.join(BASE_DIR, "stage_cache")
+STAGE_CACHE_MAX_MB = 2048  # least recently used entries are evicted beyond this
+
+# ----------------------------
+# Memory-compact dtypes (see etl/dtypes.py)
+# ----------------------------
+COMPACT_DTYPES = True  # categoricals, Arrow-backed key strings, downcast integers; False = parser defaults
+DTYPE_REPORT = False  # log bytes per column before / after compacting each dimension and fact frame
+
+# ----------------------------
+# Warehouse Backend
+# ----------------------------
+# "mssql": SQL Server (connection below)
+# "sqlite" / "duckdb": embedded file database for local runs and benchmarks
+DB_BACKEND = "mssql"
+SQLITE_DB_FILE = os.path.join(BASE_DIR, "warehouse.sqlite")
+DUCKDB_DB_FILE = os.path.join(BASE_DIR, "warehouse.duckdb")  # needs duckdb and duckdb_engine
+
 # ----------------------------
 # SQL Server Connection
 # ----------------------------
@@ -22,6 +57,15 @@ DB_NAME = "sale_warehouse"
 DB_DRIVER = "ODBC Driver 17 for SQL Server"
 TRUSTED_CONNECTION = True  # Windows Auth
 
+# ----------------------------
+# Connection Pool (one engine per process, created on first use)
+# ----------------------------
+DB_POOL_SIZE = 5  # connections kept open between statements and runs
+DB_MAX_OVERFLOW = 5  # extra connections under concurrent stages, closed when returned
+DB_POOL_TIMEOUT = 30  # seconds to wait for a free connection
+DB_POOL_RECYCLE = 1800  # seconds before a connection is replaced (server idle timeouts)
+DB_POOL_PRE_PING = True  # check connections on checkout, reconnect after a dropped link
+
 # ----------------------------
 # Warehouse Tables
 # ----------------------------
@@ -30,7 +74,112 @@ DIM_PRODUCT_TABLE = "dim_product"
 DIM_DATE_TABLE = "dim_date"
 FACT_SALES_TABLE = "fact_sales"
 
+# ----------------------------
+# Calendar (dim_date, YYYYMMDD smart keys)
+# ----------------------------
+CALENDAR_START = "2000-01-01"
+CALENDAR_END = "2030-12-31"  # extending the end loads the new days on the next run
+UNKNOWN_DATE_SK = -1  # key for missing, invalid or out-of-range dates
+
+# ----------------------------
+# SCD Type 2 Expiry
+# ----------------------------
+# "bulk": stage newly expired surrogate keys in a temp table, close them with one joined UPDATE
+# "row": one UPDATE statement per expired row
+SCD_EXPIRY_MODE = "bulk"
+
 # ----------------------------
 # Incremental Tracker
 # ----------------------------
 TRACKER_FILE = os.path.join(BASE_DIR, "incremental_tracker.json")
+TRACKER_TABLE = "etl_tracker"  # warehouse copy of the tracker, committed in the same transaction as each load
+FACT_LOOKBACK_DAYS = 0  # re-read orders this many days before the fact high-water mark (late arrivals)
+
+# ----------------------------
+# Sales Aggregates (summary tables refreshed after the fact load, see etl/aggregates.py)
+# ----------------------------
+AGGREGATES_ENABLED = True
+AGG_DAILY_CATEGORY_TABLE = "agg_sales_daily_category"  # order date x product category
+AGG_MONTHLY_COUNTRY_TABLE = "agg_sales_monthly_country"  # order month x customer country
+
+# ----------------------------
+# Parquet Export (star schema for downstream analytics, needs pyarrow)
+# ----------------------------
+EXPORT_ENABLED = True
+EXPORT_DIR = os.path.join(BASE_DIR, "export")  # fact_sales/order_year=YYYY/order_month=M/ + one file per dimension
+EXPORT_COMPRESSION = "zstd"
+EXPORT_ROW_GROUP_SIZE = 128000  # rows per row group (unit of min / max statistics)
+
+# ----------------------------
+# Source Manifest (fingerprints of source files and subject areas)
+# ----------------------------
+MANIFEST_FILE = os.path.join(BASE_DIR, "source_manifest.json")
+
+# ----------------------------
+# Dimension Snapshots (current rows, refreshed incrementally)
+# ----------------------------
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "snapshots")  # delete to force a full re-read
+SNAPSHOT_CHUNK_SIZE = 50000  # rows fetched per round-trip
+LOOKUP_DIR = os.path.join(BASE_DIR, "lookups")  # fact key indexes, one per dimension version
+
+# ----------------------------
+# Surrogate Key Allocator
+# ----------------------------
+KEY_STATE_FILE = os.path.join(BASE_DIR, "surrogate_keys.json")  # per-table high-water marks
+SK_BLOCK_SIZE = 10000  # keys reserved per allocation
+
+# ----------------------------
+# Fact Streaming
+# ----------------------------
+FACT_STREAMING = False  # stream sales_details.csv chunk by chunk into fact_sales
+FACT_CHUNK_SIZE = None  # rows per chunk; None derives it from FACT_MEMORY_LIMIT_MB
+FACT_MEMORY_LIMIT_MB = 256  # memory ceiling for one chunk in flight
+
+# ----------------------------
+# Bulk Loading
+# ----------------------------
+# "executemany": parameter batches (fast_executemany)
+# "multi": multi-row INSERT ... VALUES statements
+# "bulk": BULK INSERT from a CSV file on SQL Server, registered DataFrame scan on DuckDB
+LOAD_STRATEGY = "executemany"
+LOAD_BATCH_SIZE = None  # rows per batch; None sizes batches from LOAD_TARGET_BATCH_MB
+LOAD_TARGET_BATCH_MB = 8  # approximate data per round-trip
+BULK_LOAD_DIR = os.path.join(BASE_DIR, "bulk")  # CSV files for BULK INSERT; must be readable by SQL Server
+
+# ----------------------------
+# Fact Key Lookups
+# ----------------------------
+# "asof": the one dimension version valid at the order date (product start_date, then
+#         SCD2 effective_date intervals)
+# "current": the current dimension rows (a key matching several rows fans out)
+FACT_LOOKUP_MODE = "asof"
+
+# ----------------------------
+# Partitioned Fact Transform
+# ----------------------------
+FACT_WORKERS = 1  # processes mapping fact keys; 1 = in-process, None = all cores
+FACT_PARTITIONS = None  # partitions of the sales frame; None = one per worker
+FACT_PARTITION_BY = "hash"  # "hash" of sls_ord_num or "date" (order-date ranges)
+FACT_PARALLEL_MIN_ROWS = 250000  # smaller sales frames are mapped in-process
+
+# ----------------------------
+# Pipeline Scheduler
+# ----------------------------
+PIPELINE_WORKERS = 4  # stages run concurrently (1 = strictly sequential)
+
+# ----------------------------
+# Run Metrics
+# ----------------------------
+METRICS_ENABLED = True  # per-stage wall/CPU time, rows, peak RSS and DB round-trips
+METRICS_DIR = os.path.join(BASE_DIR, "metrics")  # one run-<timestamp>.json per run
+METRICS_PROFILE = False  # also write a cProfile capture of every stage, merged (run-<timestamp>.prof)
+METRICS_RSS_INTERVAL = 0.05  # seconds between RSS samples
+
+# ----------------------------
+# Run Journal (checkpointed, resumable runs)
+# ----------------------------
+JOURNAL_ENABLED = True  # record every stage's status and output
+JOURNAL_FILE = os.path.join(BASE_DIR, "run_journal.sqlite")  # embedded SQLite journal of runs and stages
+JOURNAL_DIR = os.path.join(BASE_DIR, "journal")  # materialized stage outputs, kept until the run succeeds
+RESUME_RUNS = True  # resume a failed run from its completed stages when its sources are unchanged
+JOURNAL_KEEP_RUNS = 100  # finished runs kept in the journal
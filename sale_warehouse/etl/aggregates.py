@@ -0,0 +1,204 @@
+# aggregates.py
+import logging
+import time
+
+import numpy as np
+from config import *
+
+# ----------------------------
+# Aggregate tables
+# ----------------------------
+# grain:     "day" (period key = order date key YYYYMMDD) or "month" (YYYYMM)
+# dimension: (table, surrogate key joined from fact_sales, grouped attribute columns)
+#
+# Facts join their dimension on the surrogate key, i.e. the dimension version
+# current when they were loaded. SCD2 never updates those rows in place, so a
+# summarized partition only changes when facts are added to it.
+AGGREGATES = {
+    AGG_DAILY_CATEGORY_TABLE: {
+        "grain": "day",
+        "dimension": (DIM_PRODUCT_TABLE, "product_sk", ["category"]),
+    },
+    AGG_MONTHLY_COUNTRY_TABLE: {
+        "grain": "month",
+        "dimension": (DIM_CUSTOMER_TABLE, "customer_sk", ["country"]),
+    },
+}
+
+PERIOD_COLUMNS = {"day": "date_sk", "month": "month_key"}
+
+# Measures of every aggregate: column -> (SQL type, expression over the fact alias f)
+MEASURES = {
+    "sales_amount": ("FLOAT", "SUM(f.sls_sales)"),
+    "quantity": ("BIGINT", "SUM(f.sls_quantity)"),
+    "order_lines": ("BIGINT", "COUNT(*)"),
+    "orders": ("BIGINT", "COUNT(DISTINCT f.sls_ord_num)"),
+}
+
+
+def tracker_key(table):
+    # Largest sales_sk already summarized into the table
+    return f"{table}_sales_sk"
+
+
+# ----------------------------
+# Periods
+# ----------------------------
+def period_expression(grain):
+    """
+    SQL period key of a fact row (the unknown date member stays -1).
+    """
+    if grain == "day":
+        return "f.order_date_sk"
+    if grain == "month":
+        # dim_date parts may be stored as SMALLINT (dtype policy): widen before multiplying
+        return f"COALESCE(CAST(d.year AS BIGINT) * 100 + d.month, {UNKNOWN_DATE_SK})"
+    raise ValueError(f"Unknown aggregate grain {grain!r}, expected 'day' or 'month'")
+
+
+def period_keys(date_keys, grain):
+    """
+    Period keys of YYYYMMDD order date keys, as period_expression computes them.
+    """
+    keys = np.unique(np.asarray(date_keys, dtype='int64'))
+    if grain == "month":
+        keys = np.unique(np.where(keys == UNKNOWN_DATE_SK, UNKNOWN_DATE_SK, keys // 100))
+    return keys
+
+
+def date_key_range(periods, grain):
+    """
+    Smallest and largest order date key of the given periods, so the fact
+    scan can be narrowed on order_date_sk before grouping.
+    """
+    if grain == "day":
+        return int(periods.min()), int(periods.max())
+    low, high = int(periods.min()), int(periods.max())
+    return (low * 100 if low != UNKNOWN_DATE_SK else UNKNOWN_DATE_SK), high * 100 + 99
+
+
+# ----------------------------
+# Tables
+# ----------------------------
+def ensure_aggregate_table(conn, table, spec):
+    """
+    Create an aggregate table if missing.
+
+    Returns:
+        True when the table already existed
+    """
+    from sqlalchemy import inspect, text
+    from .backend import create_index
+
+    if inspect(conn).has_table(table):
+        return True
+    columns = [f"{PERIOD_COLUMNS[spec['grain']]} BIGINT NOT NULL"]
+    columns += [f"{col} VARCHAR(100)" for col in spec["dimension"][2]]
+    columns += [f"{col} {col_type}" for col, (col_type, _) in MEASURES.items()]
+    conn.execute(text(f"CREATE TABLE {table} ({', '.join(columns)})"))
+    create_index(conn, f"ix_{table}_period", table, PERIOD_COLUMNS[spec['grain']])
+    return False
+
+
+def ensure_fact_indexes(conn):
+    """
+    Indexes the refresh reads fact_sales through: new rows by sales_sk,
+    touched partitions by order_date_sk.
+    """
+    from .backend import create_index
+
+    for col in ["sales_sk", "order_date_sk"]:
+        create_index(conn, f"ix_{FACT_SALES_TABLE}_{col}", FACT_SALES_TABLE, col)
+
+
+def refresh_aggregate(conn, table, spec, date_keys):
+    """
+    Recompute the periods of one aggregate table touched by the given order
+    date keys: delete their rows and summarize their facts again, through a
+    temp table of the touched period keys.
+
+    Returns:
+        number of periods recomputed
+    """
+    from sqlalchemy import text
+    from .backend import temp_table_name, create_temp_table
+
+    grain = spec["grain"]
+    periods = period_keys(date_keys, grain)
+    if len(periods) == 0:
+        return 0
+
+    dim_table, sk_col, attributes = spec["dimension"]
+    period_col = PERIOD_COLUMNS[grain]
+    period = period_expression(grain)
+    low, high = date_key_range(periods, grain)
+
+    stage = temp_table_name(conn, f"stage_{table}")
+    create_temp_table(conn, stage, [("period_key", "BIGINT")])
+    conn.execute(text(f"INSERT INTO {stage} (period_key) VALUES (:period_key)"),
+                 [{"period_key": int(p)} for p in periods])
+
+    conn.execute(text(f"DELETE FROM {table} WHERE {period_col} IN (SELECT period_key FROM {stage})"))
+
+    date_join = f"JOIN {DIM_DATE_TABLE} d ON d.date_sk = f.order_date_sk" if grain != "day" else ""
+    group = [period] + [f"x.{col}" for col in attributes]
+    conn.execute(text(f"""
+        INSERT INTO {table} ({", ".join([period_col] + attributes + list(MEASURES))})
+        SELECT {", ".join(group + [expr for _, expr in MEASURES.values()])}
+        FROM {FACT_SALES_TABLE} f
+        {date_join}
+        LEFT JOIN {dim_table} x ON x.{sk_col} = f.{sk_col}
+        WHERE f.order_date_sk BETWEEN :low AND :high
+          AND {period} IN (SELECT period_key FROM {stage})
+        GROUP BY {", ".join(group)}
+    """), {"low": low, "high": high})
+    conn.execute(text(f"DROP TABLE {stage}"))
+    return len(periods)
+
+
+def refresh_aggregates(tables=None):
+    """
+    Bring every aggregate table up to date with fact_sales. Only the periods
+    holding facts loaded since the table's last refresh (sales_sk above its
+    tracker mark) are recomputed; a new table is built from the full history.
+    Each table commits with its tracker mark, so a failed refresh is caught
+    up on the next run, whichever way the facts were loaded.
+
+    Returns:
+        dict table -> number of periods recomputed
+    """
+    from sqlalchemy import inspect, text
+    from .utils import get_engine
+    from .load import get_tracker, record_tracker, update_tracker
+
+    tracker = get_tracker()
+    refreshed = {}
+
+    for table in tables or AGGREGATES:
+        spec = AGGREGATES[table]
+        start = time.perf_counter()
+        with get_engine().begin() as conn:
+            if not inspect(conn).has_table(FACT_SALES_TABLE):
+                logging.info(f"Skipped {table}: {FACT_SALES_TABLE} does not exist yet")
+                continue
+            ensure_fact_indexes(conn)
+            # A missing table (new, or dropped to force a rebuild) starts from the first fact
+            mark = tracker.get(tracker_key(table), 0) if ensure_aggregate_table(conn, table, spec) else 0
+            last_sk = conn.execute(text(f"SELECT MAX(sales_sk) FROM {FACT_SALES_TABLE}")).scalar()
+            if last_sk is None or int(last_sk) <= mark:
+                logging.info(f"{table} is up to date")
+                refreshed[table] = 0
+                continue
+
+            date_keys = [r[0] for r in conn.execute(text(
+                f"SELECT DISTINCT order_date_sk FROM {FACT_SALES_TABLE} WHERE sales_sk > :mark"
+            ), {"mark": mark})]
+            refreshed[table] = refresh_aggregate(conn, table, spec, date_keys)
+            record_tracker(conn, tracker_key(table), int(last_sk))
+
+        update_tracker(tracker_key(table), int(last_sk))
+        logging.info(
+            f"Refreshed {refreshed[table]} {spec['grain']} periods of {table} "
+            f"in {time.perf_counter() - start:.3f}s"
+        )
+    return refreshed
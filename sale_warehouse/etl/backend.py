@@ -0,0 +1,165 @@
+# backend.py
+import logging
+import os
+
+from config import *
+
+# ----------------------------
+# Warehouse backends (DB_BACKEND in config.py)
+# ----------------------------
+BACKENDS = ("mssql", "sqlite", "duckdb")
+
+
+def database_url(backend=None):
+    """
+    SQLAlchemy URL of the configured warehouse.
+
+    - "mssql": SQL Server through pyodbc (Windows authentication)
+    - "sqlite": embedded file database at SQLITE_DB_FILE
+    - "duckdb": embedded file database at DUCKDB_DB_FILE (needs duckdb_engine)
+    """
+    backend = backend or DB_BACKEND
+    if backend == "mssql":
+        return f"mssql+pyodbc://@{DB_SERVER}/{DB_NAME}?driver={DB_DRIVER.replace(' ', '+')}&trusted_connection=yes"
+    if backend == "sqlite":
+        return f"sqlite:///{SQLITE_DB_FILE}"
+    if backend == "duckdb":
+        return f"duckdb:///{DUCKDB_DB_FILE}"
+    raise ValueError(f"Unknown DB_BACKEND {backend!r}, expected one of {BACKENDS}")
+
+
+def engine_options(backend=None):
+    """
+    create_engine() arguments: pool settings (DB_POOL_* in config.py) plus
+    extra arguments per backend.
+    """
+    backend = backend or DB_BACKEND
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if backend == "mssql":
+        options["fast_executemany"] = True
+    return options
+
+
+def reset_local_warehouse(backend=None):
+    """
+    Delete the embedded database file and the local state that describes it
+    (tracker, key allocator, snapshots, lookup indexes, manifest, run
+    journal, Parquet export) so the next run starts from an empty warehouse. Only for the
+    embedded backends.
+    """
+    import shutil
+    from .utils import dispose_engine
+    from .load import reset_tracker
+
+    backend = backend or DB_BACKEND
+    if backend == "mssql":
+        raise ValueError("reset_local_warehouse() only applies to the embedded backends")
+
+    dispose_engine()  # no pooled connection may outlive the deleted file
+    reset_tracker()
+
+    db_file = SQLITE_DB_FILE if backend == "sqlite" else DUCKDB_DB_FILE
+    for path in [db_file, db_file + ".wal", TRACKER_FILE, KEY_STATE_FILE, MANIFEST_FILE, JOURNAL_FILE]:
+        if os.path.exists(path):
+            os.remove(path)
+    for directory in [SNAPSHOT_DIR, LOOKUP_DIR, JOURNAL_DIR, EXPORT_DIR]:
+        shutil.rmtree(directory, ignore_errors=True)
+    logging.info(f"Reset local {backend} warehouse at {db_file}")
+
+
+# ----------------------------
+# Dialect-specific SQL
+# ----------------------------
+def is_mssql(conn):
+    return conn.dialect.name == "mssql"
+
+
+def temp_table_name(conn, name):
+    """
+    Session temp table name: #name on SQL Server, a TEMP table elsewhere.
+    """
+    return f"#{name}" if is_mssql(conn) else f"tmp_{name}"
+
+
+def create_temp_table(conn, stage, columns):
+    """
+    Create a session temp table from (name, type) pairs. DATETIME maps to
+    DATETIME2 on SQL Server and TIMESTAMP elsewhere.
+    """
+    from sqlalchemy import text
+
+    datetime_type = "DATETIME2" if is_mssql(conn) else "TIMESTAMP"
+    ddl = ", ".join(f"{name} {col_type.replace('DATETIME', datetime_type)}" for name, col_type in columns)
+    create = "CREATE TABLE" if is_mssql(conn) else "CREATE TEMP TABLE"
+    conn.execute(text(f"{create} {stage} ({ddl})"))
+
+
+def create_index(conn, name, table, columns):
+    """
+    CREATE INDEX unless an index of that name exists (SQL Server has no
+    CREATE INDEX IF NOT EXISTS).
+    """
+    from sqlalchemy import text
+
+    if is_mssql(conn):
+        conn.execute(text(f"""
+            IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}'))
+                CREATE INDEX {name} ON {table} ({columns})
+        """))
+    else:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def drop_index(conn, name, table):
+    """
+    DROP INDEX if an index of that name exists.
+    """
+    from sqlalchemy import text
+
+    if is_mssql(conn):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name} ON {table}"))
+    else:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def create_stage_like(conn, stage, table, columns):
+    """
+    Empty session temp table with the given columns of `table`.
+    """
+    from sqlalchemy import text
+
+    if is_mssql(conn):
+        conn.execute(text(f"SELECT TOP 0 {columns} INTO {stage} FROM {table}"))
+    else:
+        conn.execute(text(f"CREATE TEMP TABLE {stage} AS SELECT {columns} FROM {table} WHERE 1 = 0"))
+
+
+def update_from_sql(conn, table, stage, join_col, stage_col, assignments):
+    """
+    UPDATE ... joined to a stage table.
+
+    Args:
+        assignments: dict of target column -> expression over the stage alias `e`
+    """
+    if is_mssql(conn):
+        set_clause = ", ".join(f"d.{col} = {expr}" for col, expr in assignments.items())
+        return f"""
+            UPDATE d
+            SET {set_clause}
+            FROM {table} d
+            JOIN {stage} e ON d.{join_col} = e.{stage_col}
+        """
+    # SQLite (3.33+), DuckDB and PostgreSQL: UPDATE ... FROM
+    set_clause = ", ".join(f"{col} = {expr}" for col, expr in assignments.items())
+    return f"""
+        UPDATE {table}
+        SET {set_clause}
+        FROM {stage} e
+        WHERE {table}.{join_col} = e.{stage_col}
+    """
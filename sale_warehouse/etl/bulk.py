@@ -0,0 +1,144 @@
+# bulk.py
+import csv
+import logging
+import os
+import time
+import uuid
+
+from config import *
+
+# Maximum bind parameters per statement for the multi-row VALUES strategy
+PARAM_LIMITS = {"mssql": 2100, "sqlite": 999}
+
+
+# ----------------------------
+# Batch sizing
+# ----------------------------
+def auto_batch_size(df, strategy, dialect):
+    """
+    Rows per batch: about LOAD_TARGET_BATCH_MB of data per round-trip, capped
+    by the dialect's bind-parameter limit for multi-row VALUES inserts.
+    """
+    if LOAD_BATCH_SIZE:
+        batch = LOAD_BATCH_SIZE
+    else:
+        sample = df.head(1000)
+        bytes_per_row = max(sample.memory_usage(deep=True, index=False).sum() / max(len(sample), 1), 1)
+        batch = int(LOAD_TARGET_BATCH_MB * 1024 * 1024 / bytes_per_row)
+        batch = min(max(batch, 1000), 100000)
+
+    if strategy == "multi":
+        limit = PARAM_LIMITS.get(dialect, 2100)
+        batch = min(batch, max((limit - 1) // max(len(df.columns), 1), 1))
+    return batch
+
+
+# ----------------------------
+# Strategies
+# ----------------------------
+def _ensure_table(df, table, conn):
+    """
+    Create the target table from the frame's schema if it does not exist yet
+    and return its column order.
+    """
+    from sqlalchemy import inspect, text
+
+    if not table.startswith("#") and not inspect(conn).has_table(table):
+        df.head(0).to_sql(table, conn, if_exists='append', index=False)
+    return list(conn.execute(text(f"SELECT * FROM {table} WHERE 1 = 0")).keys())
+
+
+def _write_csv(df, columns):
+    os.makedirs(BULK_LOAD_DIR, exist_ok=True)
+    path = os.path.join(BULK_LOAD_DIR, f"{uuid.uuid4().hex}.csv")
+    df.reindex(columns=columns).to_csv(
+        path, index=False, header=False, quoting=csv.QUOTE_MINIMAL,
+        date_format="%Y-%m-%d %H:%M:%S", na_rep=""
+    )
+    return path
+
+
+def _bulk_mssql(df, table, conn):
+    """
+    BCP-style load: write a CSV file and BULK INSERT it through the open
+    connection, so it stays inside the caller's transaction (and can reach
+    session temp tables). BULK_LOAD_DIR must be readable by the SQL Server service.
+    """
+    from sqlalchemy import text
+
+    columns = _ensure_table(df, table, conn)
+    path = _write_csv(df, columns)
+    try:
+        conn.execute(text(f"""
+            BULK INSERT {table} FROM '{os.path.abspath(path)}'
+            WITH (FORMAT = 'CSV', FIELDTERMINATOR = ',', ROWTERMINATOR = '0x0a',
+                  KEEPNULLS, TABLOCK)
+        """))
+    finally:
+        os.remove(path)
+
+
+def _bulk_duckdb(df, table, conn):
+    """
+    Register the frame as a view on the connection's DuckDB handle and copy it
+    with one INSERT ... SELECT (columnar scan, no per-row parameters), inside
+    the caller's transaction.
+    """
+    from sqlalchemy import text
+
+    columns = _ensure_table(df, table, conn)
+    view = f"bulk_{uuid.uuid4().hex}"
+    duck = conn.connection.driver_connection
+    duck.register(view, df.reindex(columns=columns))
+    try:
+        conn.execute(text(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {view}"))
+    finally:
+        duck.unregister(view)
+
+
+# ----------------------------
+# Entry point
+# ----------------------------
+def bulk_insert(df, table, conn, strategy=None):
+    """
+    Append a DataFrame to a table with the configured load strategy and log
+    rows per second.
+
+    Strategies (LOAD_STRATEGY):
+        "executemany": parameter batches (fast_executemany on SQL Server)
+        "multi": multi-row INSERT ... VALUES statements
+        "bulk": BULK INSERT from a CSV file on SQL Server, a registered
+            DataFrame scan on DuckDB; SQLite falls back to "executemany"
+
+    Returns:
+        number of rows sent
+    """
+    if df is None or df.empty:
+        return 0
+
+    strategy = strategy or LOAD_STRATEGY
+    dialect = conn.dialect.name
+    start = time.perf_counter()
+
+    if strategy == "bulk" and dialect == "mssql":
+        _bulk_mssql(df, table, conn)
+        batch = len(df)
+    elif strategy == "bulk" and dialect == "duckdb":
+        _bulk_duckdb(df, table, conn)
+        batch = len(df)
+    else:
+        if strategy == "bulk":
+            logging.info(f"No file-based bulk path for {dialect}, using executemany for {table}")
+            strategy = "executemany"
+        batch = auto_batch_size(df, strategy, dialect)
+        df.to_sql(
+            table, conn, if_exists='append', index=False, chunksize=batch,
+            method='multi' if strategy == "multi" else None
+        )
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    logging.info(
+        f"Bulk loaded {len(df)} rows into {table} via {strategy} "
+        f"(batch {batch}) in {elapsed:.3f}s ({len(df) / elapsed:,.0f} rows/s)"
+    )
+    return len(df)
@@ -0,0 +1,132 @@
+# dates.py
+import logging
+
+import numpy as np
+import pandas as pd
+from config import *
+
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+# ----------------------------
+# Smart date keys (YYYYMMDD integers)
+# ----------------------------
+def date_key(dates):
+    """
+    Smart key YYYYMMDD for a datetime Series.
+    """
+    dates = pd.to_datetime(dates)
+    return (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).astype('int64')
+
+
+def is_valid_date_key(keys):
+    """
+    Vectorized check that YYYYMMDD integers are real calendar dates.
+    """
+    keys = np.asarray(keys, dtype='int64')
+    year, month, day = keys // 10000, keys // 100 % 100, keys % 100
+    month_ok = (month >= 1) & (month <= 12)
+    leap = ((year % 4 == 0) & (year % 100 != 0)) | (year % 400 == 0)
+    max_day = _DAYS_IN_MONTH[np.where(month_ok, month, 0)] + ((month == 2) & leap)
+    return month_ok & (day >= 1) & (day <= max_day)
+
+
+def date_keys_from_source(values, start=None, end=None):
+    """
+    Map source YYYYMMDD integers straight to dim_date keys with arithmetic only:
+    no parsing and no joins. Invalid or out-of-calendar dates map to the
+    unknown member.
+
+    Returns:
+        numpy int64 array of date keys
+    """
+    start_key = int(date_key(pd.Series([pd.Timestamp(start or CALENDAR_START)]))[0])
+    end_key = int(date_key(pd.Series([pd.Timestamp(end or CALENDAR_END)]))[0])
+
+    keys = pd.to_numeric(pd.Series(values), errors='coerce').fillna(UNKNOWN_DATE_SK).to_numpy(dtype='int64')
+    valid = (keys >= start_key) & (keys <= end_key) & is_valid_date_key(keys)
+    return np.where(valid, keys, UNKNOWN_DATE_SK)
+
+
+def date_key_days(values):
+    """
+    Days since 1970-01-01 of source YYYYMMDD integers, with arithmetic only.
+
+    Returns:
+        days: numpy int64 array (0 where invalid)
+        valid: mask of the values that are real calendar dates
+    """
+    keys = pd.to_numeric(pd.Series(values), errors='coerce').fillna(0).to_numpy(dtype='int64')
+    valid = is_valid_date_key(keys) & (keys > 0)
+    keys = np.where(valid, keys, 19700101)
+    months = (keys // 10000 - 1970) * 12 + keys // 100 % 100 - 1
+    days = months.astype('datetime64[M]').astype('datetime64[D]').astype('int64') + keys % 100 - 1
+    return days, valid
+
+
+# ----------------------------
+# Calendar dimension
+# ----------------------------
+def generate_calendar(start=None, end=None):
+    """
+    Generate dim_date for every day between start and end (inclusive),
+    keyed by YYYYMMDD smart keys, plus the unknown member row.
+    """
+    from .mapping import apply_mapping
+
+    days = pd.date_range(start or CALENDAR_START, end or CALENDAR_END, freq='D')
+    df = apply_mapping("dim_date", {"calendar": pd.DataFrame({'full_date': days})})
+
+    unknown = pd.DataFrame({
+        'date_sk': [UNKNOWN_DATE_SK],
+        'full_date': pd.Series([pd.NaT], dtype=df['full_date'].dtype),
+        'day': pd.array([None], dtype='Int64'),
+        'month': pd.array([None], dtype='Int64'),
+        'month_name': ['Unknown'],
+        'quarter': pd.array([None], dtype='Int64'),
+        'year': pd.array([None], dtype='Int64'),
+    })
+
+    return pd.concat([unknown, df], ignore_index=True)
+
+
+# ----------------------------
+# Migration from generated keys
+# ----------------------------
+def migrate_to_smart_date_keys(engine=None):
+    """
+    Re-key an existing warehouse to smart date keys: remap the three fact
+    date keys through the old dim_date (out-of-calendar dates become the
+    unknown member), then replace dim_date with the generated calendar.
+    Run after keys.migrate_to_integer_keys().
+    """
+    from sqlalchemy import text
+    from .utils import get_engine
+    from .load import get_tracker, record_tracker, update_tracker
+
+    engine = engine or get_engine()
+    calendar = generate_calendar()
+    start, end = pd.Timestamp(CALENDAR_START), pd.Timestamp(CALENDAR_END)
+    last_sk = int(calendar['date_sk'].max())
+    tracker = get_tracker()
+
+    with engine.begin() as conn:
+        for col in ['order_date_sk', 'ship_date_sk', 'due_date_sk']:
+            conn.execute(text(f"""
+                UPDATE f
+                SET f.{col} = CASE
+                    WHEN d.full_date BETWEEN :start AND :end
+                    THEN YEAR(d.full_date) * 10000 + MONTH(d.full_date) * 100 + DAY(d.full_date)
+                    ELSE :unknown
+                END
+                FROM {FACT_SALES_TABLE} f
+                LEFT JOIN {DIM_DATE_TABLE} d ON f.{col} = d.date_sk
+            """), {"start": start.to_pydatetime(), "end": end.to_pydatetime(), "unknown": UNKNOWN_DATE_SK})
+
+        conn.execute(text(f"DELETE FROM {DIM_DATE_TABLE}"))
+        calendar.to_sql(DIM_DATE_TABLE, conn, if_exists='append', index=False)
+        record_tracker(conn, "dim_date_sk", last_sk)
+
+    tracker.pop("dim_date", None)
+    update_tracker("dim_date_sk", last_sk)
+    logging.info(f"Migrated {DIM_DATE_TABLE} to smart keys ({len(calendar)} calendar rows)")
@@ -0,0 +1,122 @@
+# dtypes.py
+import logging
+
+import pandas as pd
+from pandas.api.types import is_integer_dtype
+from config import *
+
+
+def _string_dtype():
+    """
+    Arrow-backed strings when pyarrow is installed (one contiguous buffer
+    instead of a Python object per cell), plain str otherwise.
+    """
+    from importlib.util import find_spec
+
+    # Checked without importing pyarrow, to keep importing the etl package cheap
+    return "string[pyarrow]" if find_spec("pyarrow") is not None else "str"
+
+
+# ----------------------------
+# Parser dtypes of the declared source schemas (schemas.py)
+# ----------------------------
+STRING = _string_dtype() if COMPACT_DTYPES else "str"
+CATEGORY = "category" if COMPACT_DTYPES else "str"
+# Nullable: a blank cell reads as <NA> instead of failing the parse
+INT32 = "Int32" if COMPACT_DTYPES else "Int64"  # YYYYMMDD dates and quantities fit in 32 bits
+
+# ----------------------------
+# Column policy of the dimension and fact frames
+# ----------------------------
+# Low-cardinality text, held as categoricals (integer codes + one copy of each value)
+CATEGORY_COLUMNS = {
+    "gender", "marital_status", "country", "product_line",
+    "category", "subcategory", "maintenance", "month_name",
+}
+# Both flags are categories up front, so rows can be expired in place
+FLAG_DTYPE = pd.CategoricalDtype(["N", "Y"])
+# Business keys, order numbers and free text: high cardinality, Arrow-backed strings
+STRING_COLUMNS = {
+    "customer_key", "product_key", "sls_ord_num", "sls_prd_key",
+    "first_name", "last_name", "birth_date", "product_name",
+}
+# Surrogate keys stay 64-bit (BIGINT in the warehouse)
+WIDE_INT_COLUMNS = {"customer_sk", "product_sk", "sales_sk"}
+
+
+def _compact_column(col, s):
+    if col == "current_flag":
+        return s.astype(FLAG_DTYPE)
+    if col in CATEGORY_COLUMNS:
+        return s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+    if col in STRING_COLUMNS:
+        return s.astype(STRING)
+    if is_integer_dtype(s.dtype) and col not in WIDE_INT_COLUMNS:
+        return pd.to_numeric(s, downcast="integer")
+    return s
+
+
+def compact_frame(df, name=None):
+    """
+    Apply the dtype policy to a dimension or fact frame:
+    - low-cardinality text (CATEGORY_COLUMNS, current_flag) -> categoricals
+    - business keys and free text (STRING_COLUMNS) -> Arrow-backed strings
+    - other integer columns (date keys, ids, quantities, calendar parts) ->
+      the smallest integer type holding their values
+
+    Surrogate keys stay 64-bit and floats (money) keep their precision.
+    Dates are parsed once at extract and are not touched here. Compacting an
+    already compact frame is a cheap no-op.
+
+    Args:
+        name: frame name for the memory report (DTYPE_REPORT)
+
+    Returns:
+        compacted copy of df (df itself is not modified)
+    """
+    if not COMPACT_DTYPES or df is None or df.empty:
+        return df
+
+    compact = pd.DataFrame(
+        {col: _compact_column(col, df[col]) for col in df.columns},
+        index=df.index
+    )
+    if DTYPE_REPORT and name:
+        log_memory_report(name, memory_report(df, compact))
+    return compact
+
+
+# ----------------------------
+# Memory budget
+# ----------------------------
+def memory_report(before, after):
+    """
+    Bytes per column of two versions of a frame (deep, i.e. including the
+    Python strings behind object columns).
+
+    Returns:
+        DataFrame indexed by column with dtype_before, bytes_before,
+        dtype_after, bytes_after and ratio (after / before), plus a TOTAL row
+    """
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "bytes_before": before.memory_usage(deep=True, index=False),
+        "dtype_after": after.dtypes.astype(str),
+        "bytes_after": after.memory_usage(deep=True, index=False),
+    })
+    report.loc["TOTAL"] = ["", report["bytes_before"].sum(), "", report["bytes_after"].sum()]
+    report["ratio"] = (report["bytes_after"] / report["bytes_before"]).round(3)
+    return report
+
+
+def log_memory_report(name, report):
+    for col, r in report.drop(index="TOTAL").iterrows():
+        logging.info(
+            f"  {name}.{col}: {r['dtype_before']} {r['bytes_before']:,} B -> "
+            f"{r['dtype_after']} {r['bytes_after']:,} B"
+        )
+    total = report.loc["TOTAL"]
+    logging.info(
+        f"Compacted {name}: {total['bytes_before'] / 1048576:.1f} MB -> "
+        f"{total['bytes_after'] / 1048576:.1f} MB ({total['ratio']:.0%} of the original)"
+    )
@@ -0,0 +1,211 @@
+# export.py
+import glob
+import logging
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from config import *
+from .dtypes import compact_frame
+
+# Exported dimensions: table -> surrogate key column
+EXPORT_DIMENSIONS = {
+    DIM_CUSTOMER_TABLE: "customer_sk",
+    DIM_PRODUCT_TABLE: "product_sk",
+    DIM_DATE_TABLE: "date_sk",
+}
+# Datetime columns, parsed on read (SQLite returns them as text)
+EXPORT_DATES = {
+    DIM_CUSTOMER_TABLE: ["customer_create_date", "effective_date", "end_date"],
+    DIM_PRODUCT_TABLE: ["start_date", "end_date", "effective_date", "end_date_histroy"],
+    DIM_DATE_TABLE: ["full_date"],
+    FACT_SALES_TABLE: ["created_date"],
+}
+FACT_MARK_KEY = "export_fact_sales_sk"  # largest sales_sk exported (tracker)
+PART_FILE = re.compile(r"part-(\d+)-(\d+)\.parquet$")
+
+
+def export_available():
+    """
+    The export writes Parquet and needs the optional pyarrow package.
+    """
+    if not EXPORT_ENABLED:
+        return False
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        logging.warning("Skipped the Parquet export: pyarrow is not installed")
+        return False
+
+
+def _write_parquet(table, path):
+    """
+    Write a Parquet file with column statistics (min / max per row group,
+    used for predicate pushdown), then rename it into place.
+    """
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(
+        table, path + ".tmp",
+        compression=EXPORT_COMPRESSION,
+        row_group_size=EXPORT_ROW_GROUP_SIZE,
+        write_statistics=True,
+    )
+    os.replace(path + ".tmp", path)
+
+
+# ----------------------------
+# fact_sales, partitioned by order year and month
+# ----------------------------
+def partition_keys(order_date_sk):
+    """
+    order_year / order_month of YYYYMMDD date keys (-1 / -1 for the unknown member).
+    """
+    keys = np.asarray(order_date_sk, dtype='int64')
+    unknown = keys == UNKNOWN_DATE_SK
+    return (
+        np.where(unknown, UNKNOWN_DATE_SK, keys // 10000).astype('int16'),
+        np.where(unknown, UNKNOWN_DATE_SK, keys // 100 % 100).astype('int8'),
+    )
+
+
+def _fact_dir():
+    return os.path.join(EXPORT_DIR, FACT_SALES_TABLE)
+
+
+def _drop_unrecorded_parts(mark):
+    """
+    Remove part files of an export that was written but whose mark was never
+    recorded (interrupted run): their rows are exported again.
+    """
+    for path in glob.glob(os.path.join(_fact_dir(), "*", "*", "part-*.parquet")):
+        match = PART_FILE.search(os.path.basename(path))
+        if match and int(match.group(1)) > mark:
+            os.remove(path)
+            logging.info(f"Removed unrecorded export file {path}")
+
+
+def export_fact_sales():
+    """
+    Append the facts loaded since the last export (sales_sk above the export
+    mark) as Hive-style partitions fact_sales/order_year=YYYY/order_month=M/.
+    Each export adds one part-<first sk>-<last sk>.parquet file per touched
+    partition, sorted by order date so row group statistics prune well;
+    files already exported are never rewritten.
+
+    Returns:
+        number of rows exported
+    """
+    import pyarrow as pa
+    from sqlalchemy import inspect, text
+    from .utils import get_engine
+    from .load import get_tracker, record_tracker, update_tracker
+
+    engine = get_engine()
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(FACT_SALES_TABLE):
+            return 0
+    mark = int(get_tracker().get(FACT_MARK_KEY, 0))
+    if not os.path.isdir(_fact_dir()):
+        mark = 0  # export directory deleted: export the full history again
+    _drop_unrecorded_parts(mark)
+
+    df = pd.concat(
+        pd.read_sql(
+            text(f"SELECT * FROM {FACT_SALES_TABLE} WHERE sales_sk > :mark"),
+            engine, params={"mark": mark}, chunksize=SNAPSHOT_CHUNK_SIZE,
+            parse_dates=EXPORT_DATES[FACT_SALES_TABLE], dtype_backend="numpy_nullable"
+        ),
+        ignore_index=True
+    )
+    if df.empty:
+        logging.info(f"No new {FACT_SALES_TABLE} rows to export")
+        return 0
+
+    first_sk, last_sk = int(df['sales_sk'].min()), int(df['sales_sk'].max())
+    df = compact_frame(df.sort_values(['order_date_sk', 'sales_sk'], kind='stable'))
+    years, months = partition_keys(df['order_date_sk'])
+    df = df.reset_index(drop=True)
+
+    # One gather per partition (rows are sorted by date, so each partition is a contiguous slice)
+    period = years.astype('int64') * 100 + months
+    bounds = np.flatnonzero(np.diff(period)) + 1
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(df)]):
+        path = os.path.join(
+            _fact_dir(), f"order_year={years[lo]}", f"order_month={months[lo]}",
+            f"part-{first_sk:012d}-{last_sk:012d}.parquet"
+        )
+        _write_parquet(pa.Table.from_pandas(df.iloc[lo:hi], preserve_index=False), path)
+
+    with engine.begin() as conn:
+        record_tracker(conn, FACT_MARK_KEY, last_sk)
+    update_tracker(FACT_MARK_KEY, last_sk)
+    logging.info(f"Exported {len(df)} {FACT_SALES_TABLE} rows to {len(bounds) + 1} partitions")
+    return len(df)
+
+
+# ----------------------------
+# Dimension snapshots
+# ----------------------------
+def export_dimension(table, sk_col):
+    """
+    Write the whole dimension (history included) as one compact Parquet file
+    (dictionary-encoded categoricals, column statistics). The file is only
+    rewritten when the dimension changed: its row count, largest key or
+    current row count differ from the last export.
+
+    Returns:
+        True when the snapshot was written
+    """
+    import pyarrow as pa
+    from sqlalchemy import inspect, text
+    from .utils import get_engine
+    from .load import get_tracker, record_tracker, update_tracker
+
+    engine = get_engine()
+    path = os.path.join(EXPORT_DIR, f"{table}.parquet")
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(table):
+            return False
+        current = "SUM(CASE WHEN current_flag = 'Y' THEN 1 ELSE 0 END)" if table != DIM_DATE_TABLE else "0"
+        version = [
+            int(v or 0) for v in
+            conn.execute(text(f"SELECT COUNT(*), MAX({sk_col}), {current} FROM {table}")).fetchone()
+        ]
+
+    key = f"export_{table}"
+    if get_tracker().get(key) == version and os.path.exists(path):
+        logging.info(f"Skipped the {table} export: unchanged")
+        return False
+
+    df = compact_frame(pd.read_sql(
+        text(f"SELECT * FROM {table} ORDER BY {sk_col}"), engine,
+        parse_dates=EXPORT_DATES[table], dtype_backend="numpy_nullable"  # nullable integers stay integers
+    ))
+    _write_parquet(pa.Table.from_pandas(df, preserve_index=False), path)
+    with engine.begin() as conn:
+        record_tracker(conn, key, version)
+    update_tracker(key, version)
+    logging.info(f"Exported {len(df)} {table} rows to {path}")
+    return True
+
+
+def export_star_schema():
+    """
+    Export stage: new fact partitions, then the changed dimension snapshots.
+
+    Returns:
+        number of fact rows exported
+    """
+    if not export_available():
+        return 0
+    start = time.perf_counter()
+    rows = export_fact_sales()
+    for table, sk_col in EXPORT_DIMENSIONS.items():
+        export_dimension(table, sk_col)
+    logging.info(f"Parquet export to {EXPORT_DIR} finished in {time.perf_counter() - start:.3f}s")
+    return rows
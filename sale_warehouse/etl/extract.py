@@ -1,22 +1,128 @@
 # extract.py
 import pandas as pd
 from config import *
+from .schemas import SOURCE_SCHEMAS, SOURCE_ORDER
+from . import staging
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
+import time
 
 def read_csv(file_path, **kwargs):
+    """
+    Read a CSV file. A read error fails the extract stage: an empty frame
+    would only surface later, after the other subject areas have loaded.
+    """
     try:
         df = pd.read_csv(file_path, **kwargs)
         logging.info(f"Read {file_path} with {len(df)} rows")
         return df
     except Exception as e:
         logging.error(f"Error reading {file_path}: {e}")
-        return pd.DataFrame()
-
-def extract_all():
-    customer = read_csv(CUSTOMER_CSV)
-    customer_loc = read_csv(CUSTOMER_LOCATION_CSV)
-    customer_info = read_csv(CUSTOMER_INFO_CSV)
-    product_cat = read_csv(PRODUCT_CATEGORIES_CSV)
-    product_info = read_csv(PRODUCT_INFO_CSV)
-    sales = read_csv(SALES_DETAILS_CSV)
-    return customer, customer_loc, customer_info, product_cat, product_info, sales
+        raise
+
+def read_csv_chunks(file_path, chunksize, **kwargs):
+    """
+    Yield a CSV file as DataFrames of at most `chunksize` rows.
+
+    A read error is raised to the consumer: ending the stream early would
+    let the fact load advance its high-water mark past rows never read.
+    """
+    try:
+        total = 0
+        with pd.read_csv(file_path, chunksize=chunksize, **kwargs) as reader:
+            for chunk in reader:
+                total += len(chunk)
+                yield chunk
+        logging.info(f"Streamed {file_path} with {total} rows in chunks of {chunksize}")
+    except Exception as e:
+        logging.error(f"Error streaming {file_path}: {e}")
+        raise
+
+def estimate_chunk_size(file_path, memory_limit_mb, sample_rows=1000, overhead=8, **kwargs):
+    """
+    Derive a chunk size from a memory ceiling by sampling the file.
+
+    `overhead` accounts for the copies made while a chunk is transformed
+    (merges, date parsing, final column subset).
+    """
+    sample = pd.read_csv(file_path, nrows=sample_rows, **kwargs)
+    if sample.empty:
+        return sample_rows
+    bytes_per_row = sample.memory_usage(deep=True, index=False).sum() / len(sample)
+    chunksize = int(memory_limit_mb * 1024 * 1024 / (bytes_per_row * overhead))
+    return max(chunksize, 1)
+
+def get_parser_engine():
+    """
+    Parser backend from EXTRACT_ENGINE; pyarrow (multithreaded) is optional
+    and falls back to the C parser when it is not installed.
+    """
+    if EXTRACT_ENGINE == "pyarrow":
+        try:
+            import pyarrow  # noqa: F401
+            return "pyarrow"
+        except ImportError:
+            logging.warning("pyarrow not installed, falling back to the C CSV parser")
+            return "c"
+    return EXTRACT_ENGINE
+
+def read_source(name, engine=None):
+    """
+    Read one source file with its declared schema (see schemas.py)
+    and log read time and throughput. Served from the staging cache when
+    the file is unchanged since it was last parsed.
+    """
+    schema = SOURCE_SCHEMAS[name]
+    path = schema["path"]
+
+    start = time.perf_counter()
+    # Unchanged files are served from the columnar staging cache
+    df = staging.load_cached(name, schema)
+    if df is None:
+        df = read_csv(path, dtype=schema["dtype"], engine=engine or get_parser_engine())
+        for col, fmt in schema["dates"].items():
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], format=fmt, errors='coerce')
+        staging.store(name, schema, df)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    size_mb = os.path.getsize(path) / (1024 * 1024) if os.path.exists(path) else 0
+    logging.info(
+        f"Extracted {name}: {len(df)} rows, {size_mb:.1f} MB in {elapsed:.3f}s "
+        f"({len(df) / elapsed:,.0f} rows/s, {size_mb / elapsed:.1f} MB/s)"
+    )
+    return df
+
+def extract_sources(names):
+    """
+    Read the given sources concurrently on a thread pool.
+
+    Returns:
+        dict source name -> DataFrame
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as pool:
+        frames = dict(zip(names, pool.map(read_source, names)))
+    logging.info(f"Extracted {len(names)} sources in {time.perf_counter() - start:.3f}s")
+    return frames
+
+def extract_all(include_sales=True, skip=()):
+    """
+    Read all source files concurrently on a thread pool.
+
+    Args:
+        include_sales: False in streaming mode, which reads sales chunk by chunk (see stream.py)
+        skip: source names not to read (e.g. subject areas unchanged since the last load)
+
+    Returns:
+        customer, customer_loc, customer_info, product_cat, product_info, sales
+        (None for every source not read)
+    """
+    names = [
+        n for n in SOURCE_ORDER
+        if (include_sales or n != "sales_details") and n not in skip
+    ]
+
+    frames = extract_sources(names)
+    return tuple(frames.get(n) for n in SOURCE_ORDER)
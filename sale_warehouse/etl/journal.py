@@ -0,0 +1,252 @@
+# journal.py
+import json
+import logging
+import os
+import pickle
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from config import *
+
+# ----------------------------
+# Journal store (embedded SQLite, one file for all runs)
+# ----------------------------
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,      -- running / failed / success / abandoned
+        attempts INTEGER NOT NULL,
+        pid INTEGER,
+        inputs TEXT NOT NULL,      -- source fingerprints and settings the run depends on
+        started TEXT NOT NULL,
+        finished TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS stages (
+        run_id TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        status TEXT NOT NULL,      -- running / failed / done
+        attempt INTEGER NOT NULL,
+        output TEXT,               -- pickled return value, kept until the run succeeds
+        seconds REAL,
+        error TEXT,
+        updated TEXT NOT NULL,
+        PRIMARY KEY (run_id, stage)
+    )""",
+]
+
+
+@contextmanager
+def _journal():
+    """
+    One journal transaction on its own connection (stages on different
+    threads never share one), with the tables in place.
+    """
+    os.makedirs(os.path.dirname(JOURNAL_FILE) or ".", exist_ok=True)
+    db = sqlite3.connect(JOURNAL_FILE, timeout=30)
+    try:
+        with db:
+            for statement in _SCHEMA:
+                db.execute(statement)
+            yield db
+    finally:
+        db.close()
+
+
+def _now():
+    return pd.Timestamp.now().isoformat()
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except (OSError, TypeError):
+        return False
+    return True
+
+
+# ----------------------------
+# Run inputs
+# ----------------------------
+def run_inputs(previous=None):
+    """
+    What a resumed run must share with the attempt that failed: size, mtime
+    and content hash of every source file, the declared schemas and the
+    settings that shape the stage graph. Content hashes are reused from
+    `previous` while size and mtime are unchanged.
+    """
+    from .schemas import SOURCE_SCHEMAS
+    from .staging import file_fingerprint, schema_hash
+
+    files, schemas = {}, {}
+    for name, schema in SOURCE_SCHEMAS.items():
+        path = schema["path"]
+        files[path] = file_fingerprint(path, previous) if os.path.exists(path) else None
+        schemas[name] = schema_hash(schema)
+    return {"files": files, "schemas": schemas, "backend": DB_BACKEND, "streaming": FACT_STREAMING}
+
+
+# ----------------------------
+# Runs
+# ----------------------------
+def _output_dir(run_id):
+    return os.path.join(JOURNAL_DIR, run_id)
+
+
+def begin_run():
+    """
+    Start a journaled run, or resume the latest run when it did not finish
+    (failed, or its process died) and its inputs are unchanged. A run that
+    cannot be resumed is marked abandoned and its outputs are deleted.
+
+    Returns:
+        run_id
+        done: dict stage -> output file of the stages completed by earlier attempts
+
+    Raises:
+        RuntimeError: when the latest run is still in progress in another process
+    """
+    with _journal() as db:
+        last = db.execute(
+            "SELECT run_id, status, attempts, pid, inputs FROM runs ORDER BY started DESC LIMIT 1"
+        ).fetchone()
+
+    previous = json.loads(last[4]) if last else None
+    inputs = run_inputs(previous)
+
+    if last is not None and last[1] in ("running", "failed"):
+        run_id, status, attempts, pid = last[:4]
+        if status == "running" and pid != os.getpid() and _process_alive(pid):
+            raise RuntimeError(f"Run {run_id} is still in progress (pid {pid})")
+
+        if RESUME_RUNS and previous == inputs:
+            with _journal() as db:
+                rows = db.execute(
+                    "SELECT stage, output FROM stages WHERE run_id = ? AND status = 'done'", (run_id,)
+                ).fetchall()
+                db.execute(
+                    "UPDATE runs SET status = 'running', attempts = ?, pid = ?, finished = NULL WHERE run_id = ?",
+                    (attempts + 1, os.getpid(), run_id)
+                )
+            done = {stage: output for stage, output in rows if output and os.path.exists(output)}
+            logging.info(f"Resuming run {run_id} (attempt {attempts + 1}): {len(done)} stages already completed")
+            return run_id, done
+
+        finish_run(run_id, "abandoned")
+        reason = "resuming is disabled" if not RESUME_RUNS else "its sources or settings changed"
+        logging.info(f"Abandoned unfinished run {run_id}: {reason}")
+
+    run_id = pd.Timestamp.now().strftime("%Y%m%dT%H%M%S%f")
+    with _journal() as db:
+        db.execute(
+            "INSERT INTO runs (run_id, status, attempts, pid, inputs, started) VALUES (?, 'running', 1, ?, ?, ?)",
+            (run_id, os.getpid(), json.dumps(inputs, sort_keys=True), _now())
+        )
+    return run_id, {}
+
+
+def finish_run(run_id, status):
+    """
+    Close a run. A successful or abandoned run no longer needs its
+    materialized outputs; a failed one keeps them for the next attempt.
+    Only the latest JOURNAL_KEEP_RUNS runs are kept in the journal.
+    """
+    if run_id is None:
+        return
+    with _journal() as db:
+        db.execute("UPDATE runs SET status = ?, finished = ? WHERE run_id = ?", (status, _now(), run_id))
+        old = [r[0] for r in db.execute(
+            "SELECT run_id FROM runs WHERE status != 'failed' ORDER BY started DESC LIMIT -1 OFFSET ?",
+            (JOURNAL_KEEP_RUNS,)
+        ).fetchall()]
+        db.executemany("DELETE FROM stages WHERE run_id = ?", [(r,) for r in old])
+        db.executemany("DELETE FROM runs WHERE run_id = ?", [(r,) for r in old])
+    if status != "failed":
+        shutil.rmtree(_output_dir(run_id), ignore_errors=True)
+
+
+# ----------------------------
+# Stages
+# ----------------------------
+def _record_stage(run_id, stage, status, output=None, seconds=None, error=None):
+    with _journal() as db:
+        attempt = db.execute("SELECT attempts FROM runs WHERE run_id = ?", (run_id,)).fetchone()[0]
+        db.execute(
+            "INSERT OR REPLACE INTO stages (run_id, stage, status, attempt, output, seconds, error, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, stage, status, attempt, output, seconds, error, _now())
+        )
+
+
+def save_output(run_id, stage, value):
+    """
+    Pickle a stage's return value (write then rename, so an interrupted
+    write never leaves a truncated output behind).
+
+    Returns:
+        path of the output file
+    """
+    directory = _output_dir(run_id)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{stage}.pkl")
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_output(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def checkpoint(run_id, done, stage, func):
+    """
+    Run one journaled stage: record its status, materialize its output once
+    it succeeds. A stage completed by an earlier attempt is not run again;
+    its output is read back instead. With run_id None (journal disabled)
+    func just runs.
+    """
+    if run_id is None:
+        return func()
+    if stage in done:
+        logging.info(f"Skipped stage {stage}: completed by an earlier attempt of run {run_id}")
+        return load_output(done[stage])
+
+    _record_stage(run_id, stage, "running")
+    start = time.perf_counter()
+    try:
+        value = func()
+    except Exception as e:
+        _record_stage(run_id, stage, "failed", seconds=time.perf_counter() - start, error=repr(e))
+        raise
+    path = save_output(run_id, stage, value)
+    _record_stage(run_id, stage, "done", output=path, seconds=time.perf_counter() - start)
+    return value
+
+
+def checkpointed(tasks, run_id, done):
+    """
+    Journal every task of a stage graph (see scheduler.run_graph) with
+    checkpoint(). Completed stages only read their output back when a stage
+    still to run depends on it.
+    """
+    if run_id is None:
+        return tasks
+
+    needed = {
+        dep for name, task in tasks.items() if name not in done
+        for dep in task.get("deps", [])
+    }
+    wrapped = {}
+    for name, task in tasks.items():
+        if name in done and name not in needed:
+            func = lambda results, name=name: logging.info(
+                f"Skipped stage {name}: completed by an earlier attempt of run {run_id}"
+            )
+        else:
+            func = lambda results, name=name, f=task["func"]: checkpoint(run_id, done, name, lambda: f(results))
+        wrapped[name] = dict(task, func=func)
+    return wrapped
@@ -0,0 +1,203 @@
+# keys.py
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from config import *
+
+# ----------------------------
+# Legacy prefixed keys (CUST1, PROD1, DATE1, SALES1)
+# ----------------------------
+LEGACY_SK_PREFIXES = {
+    "customer_sk": "CUST",
+    "product_sk": "PROD",
+    "date_sk": "DATE",
+    "order_date_sk": "DATE",
+    "ship_date_sk": "DATE",
+    "due_date_sk": "DATE",
+    "sales_sk": "SALES",
+}
+
+LEGACY_SK_COLUMNS = {
+    DIM_CUSTOMER_TABLE: ["customer_sk"],
+    DIM_PRODUCT_TABLE: ["product_sk"],
+    DIM_DATE_TABLE: ["date_sk"],
+    FACT_SALES_TABLE: ["sales_sk", "customer_sk", "product_sk",
+                       "order_date_sk", "ship_date_sk", "due_date_sk"],
+}
+
+# Table whose sequence each surrogate key column is drawn from
+SK_OWNER = {
+    DIM_CUSTOMER_TABLE: "customer_sk",
+    DIM_PRODUCT_TABLE: "product_sk",
+    DIM_DATE_TABLE: "date_sk",
+    FACT_SALES_TABLE: "sales_sk",
+}
+
+# In-memory reserved blocks: table -> [next_key, last_key]
+_blocks = {}
+_blocks_lock = threading.Lock()  # transforms may allocate keys concurrently
+
+
+def to_integer_sk(s):
+    """
+    Convert a surrogate key column to nullable integers.
+    Legacy prefixed keys ('CUST123') are stripped in one vectorized pass.
+    """
+    if pd.api.types.is_integer_dtype(s):
+        return s.astype('Int64')
+    if pd.api.types.is_float_dtype(s):
+        return s.astype('Int64')
+    digits = s.astype('string').str.replace(r'^\D+', '', regex=True)
+    return pd.to_numeric(digits, errors='coerce').astype('Int64')
+
+
+# ----------------------------
+# Persistent high-water marks
+# ----------------------------
+def load_key_state():
+    if os.path.exists(KEY_STATE_FILE):
+        try:
+            with open(KEY_STATE_FILE, "r") as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except json.JSONDecodeError:
+            return {}
+    return {}
+
+
+def save_key_state(state):
+    # Write then rename, so an interrupted write never leaves a truncated file
+    tmp_file = KEY_STATE_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump({k: int(v) for k, v in state.items()}, f)
+    os.replace(tmp_file, KEY_STATE_FILE)
+
+
+def warehouse_max_key(table):
+    """
+    Largest surrogate key already stored in the warehouse table owning the
+    sequence (0 when the table does not exist yet).
+    """
+    from sqlalchemy import inspect, text
+    from .utils import get_engine
+
+    if table not in SK_OWNER:
+        return 0
+    with get_engine().connect() as conn:
+        if not inspect(conn).has_table(table):
+            return 0
+        max_sk = conn.execute(text(f"SELECT MAX({SK_OWNER[table]}) FROM {table}")).scalar()
+    return int(max_sk or 0)
+
+
+def allocate_keys(table, n, floor=None):
+    """
+    Hand out n consecutive integer keys for a table.
+
+    Keys are reserved from the persisted high-water mark in blocks of at least
+    SK_BLOCK_SIZE, so most calls never touch the state file. Unused keys of a
+    block are skipped on the next process, like a cached database sequence.
+
+    Args:
+        table: warehouse table owning the sequence
+        n: number of keys needed
+        floor: optional callable returning the largest key already in use,
+            only evaluated when the table has no high-water mark yet (the
+            warehouse table is always checked as well)
+
+    Returns:
+        numpy int64 array of keys
+    """
+    if n == 0:
+        return np.empty(0, dtype='int64')
+
+    with _blocks_lock:
+        next_key, last_key = _blocks.get(table, (1, 0))
+        if last_key - next_key + 1 < n:
+            state = load_key_state()
+            if table in state:
+                high_water = int(state[table])
+            else:
+                # No mark (first run, or a lost state file): start past every key in use
+                high_water = max(int(floor()) if floor is not None else 0, warehouse_max_key(table))
+                logging.info(f"Seeded surrogate key high-water mark for {table} at {high_water}")
+
+            block = max(n, SK_BLOCK_SIZE)
+            next_key, last_key = high_water + 1, high_water + block
+            state[table] = last_key
+            save_key_state(state)
+
+        _blocks[table] = (next_key + n, last_key)
+    return np.arange(next_key, next_key + n, dtype='int64')
+
+
+def reserve_keys_through(table, key):
+    """
+    Make sure keys up to `key` are never handed out again, e.g. keys carried
+    by a cached transform output (memo.py) that were allocated by an earlier
+    process.
+    """
+    with _blocks_lock:
+        state = load_key_state()
+        if int(state.get(table, 0)) < key:
+            state[table] = int(key)
+            save_key_state(state)
+        next_key, last_key = _blocks.get(table, (1, 0))
+        if next_key <= key:
+            # The rest of the block overlaps the cached keys: reserve a new one
+            _blocks.pop(table, None)
+
+
+# ----------------------------
+# Migration of prefixed keys
+# ----------------------------
+def migrate_to_integer_keys(engine=None):
+    """
+    Convert the legacy VARCHAR prefixed keys of dim_customer, dim_product,
+    dim_date and fact_sales to BIGINT in place, then seed the high-water marks
+    from the migrated maxima. Tables already on integer keys are skipped.
+    """
+    from sqlalchemy import text
+    from .utils import get_engine
+
+    engine = engine or get_engine()
+    state = load_key_state()
+
+    with engine.begin() as conn:
+        for table, columns in LEGACY_SK_COLUMNS.items():
+            table_exists = conn.execute(text(
+                "SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = :table"
+            ), {"table": table}).scalar()
+            if not table_exists:
+                continue
+
+            for col in columns:
+                data_type = conn.execute(text("""
+                    SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+                    WHERE TABLE_NAME = :table AND COLUMN_NAME = :col
+                """), {"table": table, "col": col}).scalar()
+
+                if data_type is None or data_type in ("bigint", "int"):
+                    continue
+
+                prefix = LEGACY_SK_PREFIXES[col]
+                conn.execute(text(f"ALTER TABLE {table} ADD {col}_int BIGINT NULL"))
+                conn.execute(text(
+                    f"UPDATE {table} SET {col}_int = CAST(REPLACE({col}, '{prefix}', '') AS BIGINT)"
+                ))
+                conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {col}"))
+                conn.execute(text(f"EXEC sp_rename '{table}.{col}_int', '{col}', 'COLUMN'"))
+                logging.info(f"Migrated {table}.{col} from prefixed {data_type} to BIGINT")
+
+            owner_col = SK_OWNER[table]
+            max_sk = conn.execute(text(f"SELECT MAX({owner_col}) FROM {table}")).scalar()
+            state[table] = max(int(state.get(table, 0)), int(max_sk or 0))
+
+    save_key_state(state)
+    _blocks.clear()
+    logging.info(f"Surrogate key high-water marks after migration: {state}")
+    return state
@@ -1,14 +1,166 @@
 # load.py
 from .utils import get_engine, logging, load_tracker, save_tracker
+from .keys import to_integer_sk
+from .incremental import HWM_KEY, get_fact_hwm, compute_fact_hwm, hwm_to_tracker
+from .bulk import bulk_insert
+from .backend import temp_table_name, create_temp_table, create_stage_like, update_from_sql, create_index, drop_index
 from config import *
 import pandas as pd
+import json
 import os
+import threading
 
-# Create SQLAlchemy engine
-engine = get_engine()
+# Tracker, read on first use (importing this module touches neither the
+# database nor the tracker file)
+_tracker = None
+_tracker_lock = threading.RLock()  # dimension loads may run concurrently
 
-# Load or initialize tracker
-tracker = load_tracker()
+def ensure_tracker_table(conn):
+    """
+    Create TRACKER_TABLE if missing.
+
+    Returns:
+        True when the table already existed
+    """
+    from sqlalchemy import inspect, text
+
+    if inspect(conn).has_table(TRACKER_TABLE):
+        return True
+    conn.execute(text(
+        f"CREATE TABLE {TRACKER_TABLE} ("
+        f"tracker_key VARCHAR(100) NOT NULL PRIMARY KEY, tracker_value VARCHAR(1000) NOT NULL)"
+    ))
+    return False
+
+def read_tracker_table():
+    """
+    Tracker entries committed with the loads (TRACKER_TABLE).
+
+    A database with warehouse tables but no tracker table (loaded before
+    TRACKER_TABLE existed) is migrated once from TRACKER_FILE. A new
+    database starts with an empty tracker, whatever the file still holds.
+    """
+    from sqlalchemy import inspect, text
+
+    with get_engine().begin() as conn:
+        if ensure_tracker_table(conn):
+            rows = conn.execute(text(f"SELECT tracker_key, tracker_value FROM {TRACKER_TABLE}")).fetchall()
+            return {key: json.loads(value) for key, value in rows}
+
+        warehouse_tables = [DIM_CUSTOMER_TABLE, DIM_PRODUCT_TABLE, DIM_DATE_TABLE, FACT_SALES_TABLE]
+        if not any(inspect(conn).has_table(table) for table in warehouse_tables):
+            return {}
+        tracker = load_tracker()
+        for key, value in tracker.items():
+            record_tracker(conn, key, value)
+    logging.info(f"Migrated {len(tracker)} tracker entries from {TRACKER_FILE} to {TRACKER_TABLE}")
+    return tracker
+
+def get_tracker():
+    """
+    The incremental tracker, loaded once per process from TRACKER_TABLE,
+    whose entries commit together with the loads they describe.
+    TRACKER_FILE (a copy written by update_tracker) is only read when the
+    table cannot be reached.
+    """
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            try:
+                _tracker = read_tracker_table()
+            except Exception as e:
+                logging.warning(f"Could not read {TRACKER_TABLE}, using {TRACKER_FILE}: {e}")
+                _tracker = load_tracker()
+        return _tracker
+
+def reset_tracker():
+    """
+    Forget the cached tracker (the next get_tracker() reads it again).
+    """
+    global _tracker
+    with _tracker_lock:
+        _tracker = None
+
+def record_tracker(conn, key, value):
+    """
+    Write one tracker entry to TRACKER_TABLE inside the load's transaction,
+    so the advance commits or rolls back with the loaded rows. Call
+    update_tracker() once the transaction has committed.
+    """
+    from sqlalchemy import text
+
+    ensure_tracker_table(conn)
+    conn.execute(text(f"DELETE FROM {TRACKER_TABLE} WHERE tracker_key = :key"), {"key": key})
+    conn.execute(
+        text(f"INSERT INTO {TRACKER_TABLE} (tracker_key, tracker_value) VALUES (:key, :value)"),
+        {"key": key, "value": json.dumps(value)}
+    )
+
+def update_tracker(key, value):
+    """
+    Set one tracker entry and persist the tracker file.
+    """
+    with _tracker_lock:
+        tracker = get_tracker()
+        tracker[key] = value
+        save_tracker(tracker)
+
+# -----------------------------
+# SCD2 expiry
+# -----------------------------
+def get_newly_expired(dim_current, end_col):
+    """
+    Rows expired by the current transform run.
+    Falls back to every row with an end date when the transform did not flag them.
+    """
+    if dim_current is None or dim_current.empty:
+        return pd.DataFrame()
+    if 'expired' in dim_current.columns:
+        return dim_current[dim_current['expired'] == True]
+    return dim_current[dim_current[end_col].notna()]
+
+
+def expire_rows(conn, table, sk_col, end_col, expired_rows):
+    """
+    Close SCD2 versions inside an open transaction.
+
+    SCD_EXPIRY_MODE = "bulk": stage the expired surrogate keys into a temp table
+    and close them with one joined UPDATE.
+    SCD_EXPIRY_MODE = "row": one UPDATE per expired row.
+    """
+    from sqlalchemy import text
+
+    if expired_rows.empty:
+        return
+
+    params = [
+        {"sk": row_sk, "end_date": end_date}
+        for row_sk, end_date in zip(
+            to_integer_sk(expired_rows[sk_col]).tolist(),
+            pd.to_datetime(expired_rows[end_col]).dt.to_pydatetime()
+        )
+    ]
+
+    if SCD_EXPIRY_MODE == "row":
+        sql = text(f"""
+            UPDATE {table}
+            SET {end_col} = :end_date,
+                current_flag = 'N'
+            WHERE {sk_col} = :sk
+        """)
+        for p in params:
+            conn.execute(sql, p)
+    else:
+        stage = temp_table_name(conn, f"expired_{table}")
+        create_temp_table(conn, stage, [("sk", "BIGINT PRIMARY KEY"), ("end_date", "DATETIME")])
+        conn.execute(text(f"INSERT INTO {stage} (sk, end_date) VALUES (:sk, :end_date)"), params)
+        conn.execute(text(update_from_sql(
+            conn, table, stage, sk_col, "sk",
+            {end_col: "e.end_date", "current_flag": "'N'"}
+        )))
+        conn.execute(text(f"DROP TABLE {stage}"))
+
+    logging.info(f"Marked {len(expired_rows)} rows as expired in {table} ({SCD_EXPIRY_MODE} mode)")
 
 # -----------------------------
 # Load dim_customer
@@ -22,7 +174,7 @@ def load_dim_customer(df_new, dim_customer_current=None):
     from sqlalchemy import text
 
     # Load last processed date from tracker
-    last_date = tracker.get("dim_customer", "1900-01-01")
+    last_date = get_tracker().get("dim_customer", "1900-01-01")
     last_date = pd.to_datetime(last_date)
     # Only keep rows that are new or changed after the last ETL run
 
@@ -35,39 +187,19 @@ def load_dim_customer(df_new, dim_customer_current=None):
     df_to_load = df_to_load.drop(columns=['new'], errors='ignore')
 
     # -----------------------------
-    # 1️⃣ Expire old rows corresponding to these new rows
-    # -----------------------------
-    
-    if dim_customer_current is not None and not dim_customer_current.empty:
-        
-        expired_rows = dim_customer_current[
-            dim_customer_current['end_date'].notna() 
-        ]
-        if not expired_rows.empty:
-            print('HEllo')
-            sql = text(f"""
-                UPDATE {DIM_CUSTOMER_TABLE}
-                SET end_date = :end_date,
-                    current_flag = 'N'
-                WHERE customer_sk = :sk
-            """)
-            with engine.begin() as conn:
-                for _, row in expired_rows.iterrows():
-                    conn.execute(sql, {"end_date": row['end_date'], "sk": row['customer_sk']})
-            logging.info(f"Marked {len(expired_rows)} rows as expired in {DIM_CUSTOMER_TABLE}")
-
-    # -----------------------------
-    # 2️⃣ Insert new rows
+    # 1️⃣ Expire old rows, 2️⃣ insert new rows and 3️⃣ advance the tracker in one transaction
     # -----------------------------
-    df_to_load.to_sql(DIM_CUSTOMER_TABLE, engine, if_exists='append', index=False)
+    expired_rows = get_newly_expired(dim_customer_current, 'end_date')
+    last_loaded = df_to_load['effective_date'].max().strftime("%Y-%m-%d") if not df_to_load.empty else None
+    with get_engine().begin() as conn:
+        expire_rows(conn, DIM_CUSTOMER_TABLE, 'customer_sk', 'end_date', expired_rows)
+        bulk_insert(df_to_load, DIM_CUSTOMER_TABLE, conn)
+        if last_loaded is not None:
+            record_tracker(conn, "dim_customer", last_loaded)
     logging.info(f"Loaded {len(df_to_load)} new/changed rows into {DIM_CUSTOMER_TABLE}")
 
-    # -----------------------------
-    # 3️⃣ Update tracker
-    # -----------------------------
-    if( not df_to_load.empty):
-        tracker["dim_customer"] = df_to_load['effective_date'].max().strftime("%Y-%m-%d")
-        save_tracker(tracker)
+    if last_loaded is not None:
+        update_tracker("dim_customer", last_loaded)
 
 # -----------------------------
 # Load dim_product
@@ -83,7 +215,7 @@ def load_dim_product(df_new, dim_product_current=None):
     # -----------------------------
     # 0️⃣ Load tracker
     # -----------------------------
-    last_date = tracker.get("dim_product", "1900-01-01")
+    last_date = get_tracker().get("dim_product", "1900-01-01")
     last_date = pd.to_datetime(last_date)
 
     # Load logic identical to dim_customer
@@ -95,68 +227,36 @@ def load_dim_product(df_new, dim_product_current=None):
     df_to_load = df_to_load.drop(columns=['new'], errors='ignore')
 
     # -----------------------------
-    # 1️⃣ Expire old rows
+    # 1️⃣ Expire old rows, 2️⃣ insert new rows and 3️⃣ advance the tracker in one transaction
     # -----------------------------
-    if dim_product_current is not None and not dim_product_current.empty:
-
-        expired_rows = dim_product_current[
-            dim_product_current['end_date_histroy'].notna()
-        ]
-
-        if not expired_rows.empty:
-            sql = text(f"""
-                UPDATE {DIM_PRODUCT_TABLE}
-                SET end_date_histroy = :end_date_histroy,
-                    current_flag = 'N'
-                WHERE product_sk = :sk
-            """)
-
-            with engine.begin() as conn:
-                for _, row in expired_rows.iterrows():
-                    conn.execute(
-                        sql,
-                        {"end_date_histroy": row['end_date_histroy'], "sk": row['product_sk']}
-                    )
-
-            logging.info(
-                f"Marked {len(expired_rows)} rows as expired in {DIM_PRODUCT_TABLE}"
-            )
-
-    # -----------------------------
-    # 2️⃣ Insert new rows
-    # -----------------------------
-    if not df_to_load.empty:
-        df_to_load.to_sql(
-            DIM_PRODUCT_TABLE,
-            engine,
-            if_exists='append',
-            index=False
-        )
+    expired_rows = get_newly_expired(dim_product_current, 'end_date_histroy')
+    last_loaded = df_to_load['effective_date'].max().strftime("%Y-%m-%d") if not df_to_load.empty else None
+    with get_engine().begin() as conn:
+        expire_rows(conn, DIM_PRODUCT_TABLE, 'product_sk', 'end_date_histroy', expired_rows)
+        bulk_insert(df_to_load, DIM_PRODUCT_TABLE, conn)
+        if last_loaded is not None:
+            record_tracker(conn, "dim_product", last_loaded)
 
+    if last_loaded is not None:
         logging.info(
             f"Loaded {len(df_to_load)} new/changed rows into {DIM_PRODUCT_TABLE}"
         )
-
-        # -----------------------------
-        # 3️⃣ Update tracker
-        # -----------------------------
-        tracker["dim_product"] = (
-            df_to_load['effective_date'].max().strftime("%Y-%m-%d")
-        )
-        save_tracker(tracker)
+        update_tracker("dim_product", last_loaded)
     else:
         logging.info(f"No new rows to load into {DIM_PRODUCT_TABLE}")
 
 # Load dim_date
 # -----------------------------
 def load_dim_date(df):
-    last_date = tracker.get("dim_date", "1900-01-01")
-    last_date = pd.to_datetime(last_date)  # convert string back to datetime
-    df_new = df[df['full_date'] > last_date]
+    # Calendar rows beyond the last loaded smart key (the unknown member loads with the first run)
+    last_sk = get_tracker().get("dim_date_sk", None)
+    df_new = df[df['date_sk'] > last_sk] if last_sk is not None else df
     if len(df_new) > 0:
-        df_new.to_sql(DIM_DATE_TABLE, engine, if_exists='append', index=False)
-        tracker["dim_date"] = df_new['full_date'].max().strftime("%Y-%m-%d")
-        save_tracker(tracker)
+        last_sk = int(df_new['date_sk'].max())
+        with get_engine().begin() as conn:
+            bulk_insert(df_new, DIM_DATE_TABLE, conn)
+            record_tracker(conn, "dim_date_sk", last_sk)
+        update_tracker("dim_date_sk", last_sk)
         logging.info(f"Loaded {len(df_new)} rows into {DIM_DATE_TABLE}")
     else:
         logging.info(f"No new rows to load into {DIM_DATE_TABLE}")
@@ -164,18 +264,141 @@ def load_dim_date(df):
 # -----------------------------
 # Load fact_sales
 # -----------------------------
+FACT_NATURAL_KEY_INDEX = f"ix_{FACT_SALES_TABLE}_natural_key"
+
+def ensure_fact_natural_key():
+    """
+    Add sls_prd_key to a fact_sales table loaded before it was mapped,
+    backfilled from the product each row was resolved to, and move the
+    natural key index from (sls_ord_num, product_sk) to the source columns.
+    The index is created once the backfill has committed (DuckDB builds no
+    index over uncommitted updates).
+    """
+    from sqlalchemy import inspect, text
+    from .transform import derive_sales_product_key
+
+    with get_engine().begin() as conn:
+        if not inspect(conn).has_table(FACT_SALES_TABLE):
+            return
+        # Column names from an empty result (the DuckDB dialect cannot reflect columns)
+        columns = set(conn.execute(text(f"SELECT * FROM {FACT_SALES_TABLE} WHERE 1 = 0")).keys())
+        if "sls_prd_key" in columns:
+            return
+
+        drop_index(conn, FACT_NATURAL_KEY_INDEX, FACT_SALES_TABLE)
+        conn.execute(text(f"ALTER TABLE {FACT_SALES_TABLE} ADD sls_prd_key VARCHAR(50) NULL"))
+        products = pd.read_sql(text(f"SELECT product_sk, product_key FROM {DIM_PRODUCT_TABLE}"), conn)
+        if not products.empty:
+            stage = temp_table_name(conn, "fact_product_keys")
+            create_temp_table(conn, stage, [("sk", "BIGINT PRIMARY KEY"), ("prd_key", "VARCHAR(50)")])
+            conn.execute(text(f"INSERT INTO {stage} (sk, prd_key) VALUES (:sk, :prd_key)"), [
+                {"sk": sk, "prd_key": key}
+                for sk, key in zip(
+                    to_integer_sk(products['product_sk']).tolist(),
+                    derive_sales_product_key(products['product_key']).tolist()
+                )
+            ])
+            conn.execute(text(update_from_sql(
+                conn, FACT_SALES_TABLE, stage, "product_sk", "sk", {"sls_prd_key": "e.prd_key"}
+            )))
+            conn.execute(text(f"DROP TABLE {stage}"))
+
+    with get_engine().begin() as conn:
+        create_index(conn, FACT_NATURAL_KEY_INDEX, FACT_SALES_TABLE, "sls_ord_num, sls_prd_key")
+    logging.info(f"Added sls_prd_key to {FACT_SALES_TABLE}, backfilled from {DIM_PRODUCT_TABLE}")
+
+def insert_fact_rows(conn, df):
+    """
+    Land fact rows through a staging table and insert only those whose
+    natural key (sls_ord_num, sls_prd_key: source columns, unlike product_sk,
+    which changes with the product version) is not in fact_sales yet, so
+    reloading an overlapping window never duplicates facts.
+
+    Returns:
+        number of rows inserted
+    """
+    from sqlalchemy import inspect, text
+
+    if not inspect(conn).has_table(FACT_SALES_TABLE):
+        inserted = bulk_insert(df, FACT_SALES_TABLE, conn)
+        # Natural key index for the anti-join of later loads
+        create_index(conn, FACT_NATURAL_KEY_INDEX, FACT_SALES_TABLE, "sls_ord_num, sls_prd_key")
+        return inserted
+
+    stage = temp_table_name(conn, f"stage_{FACT_SALES_TABLE}")
+    columns = ", ".join(df.columns)
+    create_stage_like(conn, stage, FACT_SALES_TABLE, columns)
+    bulk_insert(df, stage, conn)
+    result = conn.execute(text(f"""
+        INSERT INTO {FACT_SALES_TABLE} ({columns})
+        SELECT {", ".join("s." + c for c in df.columns)}
+        FROM {stage} s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {FACT_SALES_TABLE} f
+            WHERE f.sls_ord_num = s.sls_ord_num
+              AND (f.sls_prd_key = s.sls_prd_key OR (f.sls_prd_key IS NULL AND s.sls_prd_key IS NULL))
+        )
+    """))
+    # DuckDB reports the inserted count as a result row, not a rowcount
+    inserted = result.scalar() if result.rowcount < 0 and result.returns_rows else result.rowcount
+    conn.execute(text(f"DROP TABLE {stage}"))
+    return inserted
+
 def load_fact_sales(df):
-    last_date = tracker.get("fact_sales", None)
+    """
+    Incremental, idempotent fact load: rows are anti-joined on the natural key
+    and the source high-water mark advances in the same step.
 
-    
+    Returns:
+        number of rows inserted
+    """
+    hwm = get_fact_hwm(get_tracker())
+    inserted = 0
 
-    # Incremental load based on order_date_sk
-    df_new = df[df['created_date'] > last_date] if last_date is not None else df
+    if len(df) > 0:
+        ensure_fact_natural_key()
+        hwm = compute_fact_hwm(df, hwm)
+        with get_engine().begin() as conn:
+            inserted = insert_fact_rows(conn, df)
+            if hwm is not None:
+                record_tracker(conn, HWM_KEY, hwm_to_tracker(hwm))
+        if hwm is not None:
+            update_tracker(HWM_KEY, hwm_to_tracker(hwm))
+        logging.info(f"Loaded {inserted} rows into {FACT_SALES_TABLE} ({len(df) - inserted} already present)")
+    else:
+        logging.info(f"No new rows to load into {FACT_SALES_TABLE}")
+    return inserted
 
-    if len(df_new) > 0:
-        df_new.to_sql(FACT_SALES_TABLE, engine, if_exists='append', index=False)
-        tracker["fact_sales"] = pd.to_datetime(df_new['created_date'].max()).strftime("%Y-%m-%d")
-        save_tracker(tracker)
-        logging.info(f"Loaded {len(df_new)} rows into {FACT_SALES_TABLE}")
+def load_fact_sales_chunks(chunks):
+    """
+    Append transformed fact_sales chunks as they arrive, each through the
+    staging anti-join. The high-water mark is saved once at the end: when
+    the stream fails (e.g. a source read error) it does not move, and the
+    chunks already committed are dropped by the anti-join on the next run.
+
+    Returns:
+        number of rows inserted
+    """
+    hwm = get_fact_hwm(get_tracker())
+    total = 0
+    received = 0
+    ensure_fact_natural_key()
+
+    for df in chunks:
+        if len(df) == 0:
+            continue
+        with get_engine().begin() as conn:
+            total += insert_fact_rows(conn, df)
+        received += len(df)
+        hwm = compute_fact_hwm(df, hwm)
+
+    if received > 0:
+        if hwm is not None:
+            # Chunks are not in order-date order: the mark only advances once all of them committed
+            with get_engine().begin() as conn:
+                record_tracker(conn, HWM_KEY, hwm_to_tracker(hwm))
+            update_tracker(HWM_KEY, hwm_to_tracker(hwm))
+        logging.info(f"Loaded {total} rows into {FACT_SALES_TABLE} (streamed, {received - total} already present)")
     else:
         logging.info(f"No new rows to load into {FACT_SALES_TABLE}")
+    return total
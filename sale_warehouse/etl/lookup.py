@@ -0,0 +1,226 @@
+# lookup.py
+import glob
+import hashlib
+import logging
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from config import *
+from .keys import to_integer_sk
+
+DAY_OFFSET = 2 ** 31  # day numbers are shifted into the low 32 bits of the as-of search keys
+LATEST_DAY = DAY_OFFSET - 1  # lookup date of rows without a valid date: the latest version
+
+
+# ----------------------------
+# Key index: business key -> surrogate key(s)
+# ----------------------------
+def build_key_index(keys, sks):
+    """
+    Build a lookup index from business keys to surrogate keys.
+
+    Keys are factorized into a hash table of unique values and the surrogate
+    keys are grouped per business key (in their original order), so a lookup
+    returns every match exactly like a left merge would.
+
+    Returns:
+        dict with 'uniques' (pd.Index), 'starts', 'counts', 'sks', 'valid'
+    """
+    codes, uniques = pd.factorize(pd.Series(keys), use_na_sentinel=False)
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes, minlength=len(uniques))
+    starts = np.cumsum(counts) - counts
+
+    sk_int = to_integer_sk(pd.Series(sks).reset_index(drop=True))
+    return {
+        'uniques': pd.Index(uniques),
+        'starts': starts,
+        'counts': counts,
+        'sks': sk_int.to_numpy(dtype='int64', na_value=0)[order],
+        'valid': sk_int.notna().to_numpy()[order],
+    }
+
+
+def resolve_keys(index, keys):
+    """
+    Vectorized left lookup of business keys.
+
+    Returns:
+        rows: position in `keys` of each output row (a key with several
+            matches yields several rows, a missing key yields one row)
+        sk: nullable Int64 array of surrogate keys aligned with rows
+    """
+    if len(index['sks']) == 0:
+        n = len(keys)
+        return np.arange(n), pd.arrays.IntegerArray(np.zeros(n, dtype='int64'), np.ones(n, dtype=bool))
+
+    codes = index['uniques'].get_indexer(keys)
+    found = codes >= 0
+    safe_codes = np.where(found, codes, 0)
+    out_counts = np.maximum(np.where(found, index['counts'][safe_codes], 0), 1)
+
+    if (out_counts == 1).all():
+        # Unique matches: no fan-out, one output row per key
+        rows = np.arange(len(codes))
+        row_found = found
+        positions = index['starts'][safe_codes]
+    else:
+        rows = np.repeat(np.arange(len(codes)), out_counts)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(out_counts) - out_counts, out_counts)
+        row_found = found[rows]
+        positions = index['starts'][safe_codes[rows]] + np.where(row_found, offsets, 0)
+
+    valid = row_found & index['valid'][positions]
+    return rows, pd.arrays.IntegerArray(index['sks'][positions], ~valid)
+
+
+# ----------------------------
+# As-of index: business key + date -> surrogate key of the version valid then
+# ----------------------------
+def day_numbers(dates):
+    """
+    Days since 1970-01-01 of a datetime column (NaT as the earliest day).
+    """
+    days = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]')
+    return np.where(np.isnat(days), -DAY_OFFSET, days.astype('int64'))
+
+
+def build_asof_index(keys, sks, effective, valid_from=None):
+    """
+    Build an as-of lookup index over the SCD2 versions of a dimension.
+
+    A business key can hold several source records, each valid from its own
+    date (`valid_from`, e.g. the product start_date), and every record has
+    its SCD2 versions, each valid from its effective_date until the next
+    one (the end date written when it was expired). Both levels are sorted
+    into arrays of search keys (high bits: key code or record number, low
+    32 bits: day), so resolving a whole batch of (key, date) pairs is two
+    searchsorted calls. Ties (same key and dates) go to the highest
+    surrogate key, i.e. the latest version: a version replaced on the day it
+    became effective is never returned, and every lookup returns one key.
+
+    Returns:
+        dict with 'uniques', 'sks', 'valid' (as build_key_index) plus
+        'records' (sorted key code / valid_from search keys) and 'search'
+        (sorted record / effective day search keys, aligned with 'sks')
+    """
+    codes, uniques = pd.factorize(pd.Series(keys), use_na_sentinel=False)
+    codes = codes.astype('int64')
+    starts = day_numbers(valid_from) if valid_from is not None else np.zeros(len(codes), dtype='int64')
+    days = day_numbers(effective)
+    sk_int = to_integer_sk(pd.Series(sks).reset_index(drop=True))
+    sk_order = sk_int.to_numpy(dtype='int64', na_value=-1)
+    order = np.lexsort((sk_order, days, starts, codes))
+
+    records = (codes[order] << 32) | (starts[order] + DAY_OFFSET)
+    new_record = np.r_[True, records[1:] != records[:-1]] if len(records) else np.empty(0, dtype=bool)
+    record = np.cumsum(new_record) - 1
+
+    return {
+        'uniques': pd.Index(uniques),
+        'sks': sk_order[order],
+        'valid': sk_int.notna().to_numpy()[order],
+        'records': records[new_record],
+        'search': (record << 32) | (days[order] + DAY_OFFSET),
+    }
+
+
+def _last_at_or_before(search, groups, days):
+    """
+    Position of the last search key of each group at or before the given
+    day; days before the group's first day get the last entry of that day.
+    """
+    high = groups.astype('int64') << 32
+    positions = np.searchsorted(search, high | (days + DAY_OFFSET), side='right') - 1
+    first = search[np.searchsorted(search, high, side='left')]
+    return np.maximum(positions, np.searchsorted(search, first, side='right') - 1)
+
+
+def resolve_keys_asof(index, keys, days):
+    """
+    Vectorized as-of lookup: the version of each business key valid at the
+    given day number, exactly one per key. Days before a key's first record
+    or version resolve to the first one (the dimension was loaded after the
+    history it describes), LATEST_DAY resolves to the current version.
+
+    Returns:
+        rows, sk as resolve_keys (rows is every position of `keys`: no fan-out)
+    """
+    if len(index['sks']) == 0:
+        return resolve_keys(index, keys)
+
+    codes = index['uniques'].get_indexer(keys)
+    found = codes >= 0
+    days = np.asarray(days, dtype='int64')
+
+    # Source record of each key valid at the day, then the version of that record valid at the day
+    record = _last_at_or_before(index['records'], np.where(found, codes, 0), days)
+    positions = _last_at_or_before(index['search'], record, days)
+
+    valid = found & index['valid'][positions]
+    return np.arange(len(codes)), pd.arrays.IntegerArray(index['sks'][positions], ~valid)
+
+
+def resolve_keys_at(index, keys, days=None):
+    """
+    resolve_keys_asof for an as-of index and lookup days, resolve_keys otherwise.
+    """
+    if days is not None and 'search' in index:
+        return resolve_keys_asof(index, keys, days)
+    return resolve_keys(index, keys)
+
+
+# ----------------------------
+# Persisted indexes, one per dimension version
+# ----------------------------
+def dimension_version(*columns):
+    """
+    Fingerprint of the columns an index is built from.
+    """
+    h = hashlib.sha256()
+    for col in columns:
+        h.update(pd.util.hash_pandas_object(pd.Series(col), index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def get_key_index(name, raw_keys, sks, derive_keys=None, effective=None, valid_from=None):
+    """
+    Key index for a dimension, reused from LOOKUP_DIR while the dimension's
+    (business key, surrogate key) columns are unchanged. `derive_keys` turns
+    the raw dimension keys into the keys used on the sales side and is only
+    applied when the index has to be rebuilt. With `effective` (the
+    effective_date of every version, plus the `valid_from` date of its
+    source record if any) an as-of index is built instead.
+    """
+    columns = [raw_keys, sks]
+    if effective is not None:
+        columns.append(day_numbers(effective))
+        if valid_from is not None:
+            columns.append(day_numbers(valid_from))
+    version = dimension_version(*columns)
+    if effective is not None:
+        name = f"{name}_asof"
+    index_file = os.path.join(LOOKUP_DIR, f"{name}-{version}.pkl")
+
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Rebuilding unreadable lookup index {index_file}: {e}")
+
+    keys = derive_keys(raw_keys) if derive_keys is not None else raw_keys
+    if effective is None:
+        index = build_key_index(keys, sks)
+    else:
+        index = build_asof_index(keys, sks, effective, valid_from)
+
+    os.makedirs(LOOKUP_DIR, exist_ok=True)
+    for old_file in glob.glob(os.path.join(LOOKUP_DIR, f"{name}-*.pkl")):
+        os.remove(old_file)
+    with open(index_file, "wb") as f:
+        pickle.dump(index, f)
+    logging.info(f"Built {name} lookup index with {len(index['uniques'])} keys (version {version})")
+    return index
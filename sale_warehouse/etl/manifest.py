@@ -0,0 +1,79 @@
+# manifest.py
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from config import *
+from .schemas import SOURCE_SCHEMAS
+from .staging import file_fingerprint, schema_hash
+
+# ----------------------------
+# Subject areas and their source files
+# ----------------------------
+SUBJECT_SOURCES = {
+    "customer": ["customer", "customer_location", "customer_info"],
+    "product": ["product_info", "product_categories"],
+}
+_manifest_lock = threading.Lock()  # subject areas may finish loading concurrently
+
+
+def load_manifest():
+    if os.path.exists(MANIFEST_FILE):
+        try:
+            with open(MANIFEST_FILE, "r") as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except json.JSONDecodeError:
+            return {}
+    return {}
+
+
+def save_manifest(manifest):
+    tmp_file = MANIFEST_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+
+def subject_fingerprint(subject, manifest=None):
+    """
+    Combined fingerprint of a subject area: content hash and declared schema
+    of every source file feeding it.
+    """
+    manifest = manifest if manifest is not None else load_manifest()
+    h = hashlib.sha256()
+    for name in SUBJECT_SOURCES[subject]:
+        schema = SOURCE_SCHEMAS[name]
+        fingerprint = file_fingerprint(schema["path"], manifest)
+        manifest.setdefault("files", {})[schema["path"]] = fingerprint
+        h.update(f"{name}:{fingerprint['hash']}:{schema_hash(schema)};".encode())
+    return h.hexdigest()
+
+
+def subject_changed(subject):
+    """
+    Returns:
+        (changed, fingerprint) for a subject area compared with the last
+        successfully loaded run
+    """
+    manifest = load_manifest()
+    fingerprint = subject_fingerprint(subject, manifest)
+    changed = manifest.get("subjects", {}).get(subject) != fingerprint
+    if not changed:
+        logging.info(f"Sources of the {subject} subject area unchanged since last load")
+    return changed, fingerprint
+
+
+def mark_subject_loaded(subject, fingerprint):
+    """
+    Record a subject area's fingerprint once its dimension load has committed.
+    """
+    with _manifest_lock:
+        manifest = load_manifest()
+        for name in SUBJECT_SOURCES[subject]:
+            path = SOURCE_SCHEMAS[name]["path"]
+            manifest.setdefault("files", {})[path] = file_fingerprint(path, manifest)
+        manifest.setdefault("subjects", {})[subject] = fingerprint
+        save_manifest(manifest)
@@ -0,0 +1,232 @@
+# mapping.py
+from functools import lru_cache
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_string_dtype
+from .dates import date_key, date_keys_from_source
+from config import *
+
+# ----------------------------
+# Source-to-target mapping (docs/source_to_target.md, machine-readable)
+# ----------------------------
+# source:    frame the target is built from (a name in the frames passed to the mapping)
+# order_by:  source columns the frame is sorted by before anything else
+# derive:    helper columns added to the source frame: column -> (source column, ops)
+# joins:     left joins, in order: {"source", "on": (left column, right column), "keys": ops on the right column}
+# columns:   target column -> {"source": column, "ops": [...]} or {"supplied": True}
+#            (a column computed by the caller, e.g. looked up surrogate keys)
+# latest_by: (key, order) keep only the last row of each key in that order
+#
+# ops are applied left to right; see OPS. An op with arguments is a tuple.
+TARGET_MAPPINGS = {
+    "dim_customer": {
+        "source": "customer_info",
+        "derive": {"cst_key": ("cst_key", ["text", "strip"])},
+        "joins": [
+            {"source": "customer", "on": ("cst_key", "CID"), "keys": ["text", "strip"]},
+            {"source": "customer_location", "on": ("cst_key", "CID"), "keys": ["text", ("replace", "-", "")]},
+        ],
+        "columns": {
+            "customer_id": {"source": "cst_id"},
+            "customer_key": {"source": "cst_key"},
+            "first_name": {"source": "cst_firstname", "ops": ["strip"]},
+            "last_name": {"source": "cst_lastname", "ops": ["strip"]},
+            "gender": {"source": "cst_gndr", "ops": ["upper"]},
+            "marital_status": {"source": "cst_marital_status", "ops": ["upper"]},
+            "birth_date": {"source": "BDATE"},
+            "country": {"source": "CNTRY"},
+            "customer_create_date": {"source": "cst_create_date", "ops": ["datetime", "cap_today"]},
+        },
+        "latest_by": ("customer_key", "customer_create_date"),
+    },
+    "dim_product": {
+        "source": "product_info",
+        "order_by": ["prd_key", "prd_start_dt"],
+        "derive": {
+            "cat_id": ("prd_key", ["text", ("parts", "-", 0, 2, "_")]),  # 'CO-RF-FR-R92B-58' -> 'CO_RF'
+            "prd_end_dt": ("prd_start_dt", [("next_in_group", "prd_key")]),  # next start date of the product
+        },
+        "joins": [
+            {"source": "product_categories", "on": ("cat_id", "ID")},
+        ],
+        "columns": {
+            "product_id": {"source": "prd_id"},
+            "product_key": {"source": "prd_key"},
+            "product_name": {"source": "prd_nm", "ops": ["strip"]},
+            "product_cost": {"source": "prd_cost"},
+            "product_line": {"source": "prd_line", "ops": ["upper"]},
+            "category": {"source": "CAT"},
+            "subcategory": {"source": "SUBCAT"},
+            "maintenance": {"source": "MAINTENANCE"},
+            "start_date": {"source": "prd_start_dt", "ops": ["datetime"]},
+            "end_date": {"source": "prd_end_dt"},
+        },
+    },
+    "dim_date": {
+        "source": "calendar",  # one full_date row per calendar day (dates.generate_calendar)
+        "columns": {
+            "date_sk": {"source": "full_date", "ops": ["date_key"]},
+            "full_date": {"source": "full_date"},
+            "day": {"source": "full_date", "ops": [("part", "day")]},
+            "month": {"source": "full_date", "ops": [("part", "month")]},
+            "month_name": {"source": "full_date", "ops": ["month_name"]},
+            "quarter": {"source": "full_date", "ops": [("part", "quarter")]},
+            "year": {"source": "full_date", "ops": [("part", "year")]},
+        },
+    },
+    "fact_sales": {
+        "source": "sales_details",
+        "columns": {
+            "sls_ord_num": {"source": "sls_ord_num"},
+            "sls_prd_key": {"source": "sls_prd_key"},  # with sls_ord_num, the natural key of an order line
+            "customer_sk": {"supplied": True},  # resolved through the key lookups (lookup.py)
+            "product_sk": {"supplied": True},
+            "order_date_sk": {"source": "sls_order_dt", "ops": ["source_date_key"]},
+            "ship_date_sk": {"source": "sls_ship_dt", "ops": ["source_date_key"]},
+            "due_date_sk": {"source": "sls_due_dt", "ops": ["source_date_key"]},
+            "sls_quantity": {"source": "sls_quantity"},
+            "sls_price": {"source": "sls_price"},
+            "sls_sales": {"source": "sls_sales"},
+        },
+    },
+}
+
+
+# ----------------------------
+# Column operations: op(series, frame, *args) -> series
+# ----------------------------
+def _text(s, frame):
+    # Text columns are already strings: only other dtypes are cast
+    return s if is_string_dtype(s.dtype) else s.astype(str)
+
+
+def _datetime(s, frame):
+    # Dates parsed at extract are not parsed again
+    return s if is_datetime64_any_dtype(s.dtype) else pd.to_datetime(s, errors='coerce')
+
+
+def _cap_today(s, frame):
+    today = pd.to_datetime("today").normalize()
+    return s.mask(s > today, today)
+
+
+def _parts(s, frame, sep, start, stop, joiner):
+    return s.str.split(sep).str[start:stop].str.join(joiner)
+
+
+OPS = {
+    "text": _text,
+    "strip": lambda s, frame: s.str.strip(),
+    "upper": lambda s, frame: s.str.upper(),
+    "replace": lambda s, frame, old, new: s.str.replace(old, new, regex=False),
+    "parts": _parts,
+    "datetime": _datetime,
+    "cap_today": _cap_today,
+    "next_in_group": lambda s, frame, by: s.groupby(frame[by]).shift(-1),
+    "date_key": lambda s, frame: date_key(s),
+    "part": lambda s, frame, name: getattr(s.dt, name).astype('Int64'),
+    "month_name": lambda s, frame: s.dt.month_name(),
+    "source_date_key": lambda s, frame: pd.Series(date_keys_from_source(s), index=s.index),
+}
+
+
+# ----------------------------
+# Compiler
+# ----------------------------
+def _compile_ops(target, column, ops):
+    """
+    Resolve the op names of one column once, at compile time.
+    """
+    steps = []
+    for op in ops or []:
+        name, *args = op if isinstance(op, tuple) else (op,)
+        if name not in OPS:
+            raise ValueError(f"Unknown op {name!r} for {target}.{column}")
+        steps.append((OPS[name], args))
+
+    def run(s, frame):
+        for func, args in steps:
+            s = func(s, frame, *args)
+        return s
+
+    return run
+
+
+@lru_cache(maxsize=None)
+def compile_mapping(target):
+    """
+    Compile the mapping of one target table into a function building it in
+    a single pass:
+    - only the source columns the mapping reads are taken from each frame
+      (the input frames are never modified)
+    - every column op runs once, on the column it applies to
+    - the target frame is assembled once, in the declared column order,
+      without renames or intermediate full-width frames
+
+    Returns:
+        build(frames, rows=None, supplied=None) -> DataFrame
+            frames: dict source name -> frame
+            rows: positions of the source rows to map (repeats allowed), all rows when None
+            supplied: dict target column -> values of the "supplied" columns
+    """
+    spec = TARGET_MAPPINGS[target]
+    derive = {
+        col: (src, _compile_ops(target, col, ops))
+        for col, (src, ops) in spec.get("derive", {}).items()
+    }
+    columns = {
+        col: None if rule.get("supplied") else (rule["source"], _compile_ops(target, col, rule.get("ops")))
+        for col, rule in spec["columns"].items()
+    }
+    joins = [
+        (join["source"], *join["on"], _compile_ops(target, join["on"][1], join.get("keys")))
+        for join in spec.get("joins", [])
+    ]
+    order_by = spec.get("order_by")
+    latest_by = spec.get("latest_by")
+
+    # Source columns the mapping reads, from whichever frame holds them
+    read = {src for src, _ in derive.values()} | {rule[0] for rule in columns.values() if rule}
+    read |= set(order_by or [])
+    read |= {left for _, left, _, _ in joins}
+
+    def build(frames, rows=None, supplied=None):
+        source = frames[spec["source"]]
+        names = [c for c in source.columns if c in read or c in derive]
+        # 1️⃣ Source rows and columns (copy-on-write: the input frame is not touched)
+        df = source[names]
+        if rows is not None:
+            df = df.take(rows).reset_index(drop=True)
+        if order_by:
+            df = df.sort_values(order_by)
+        for col, (src, run) in derive.items():
+            df[col] = run(df[src], df)
+
+        # 2️⃣ Joins, bringing in only the columns the mapping reads
+        for name, left, right, run in joins:
+            other = frames[name]
+            wanted = [c for c in other.columns if c in read and c != right and c not in df.columns]
+            keys = run(other[right], other).rename(left)
+            df = df.merge(pd.concat([keys, other[wanted]], axis=1), on=left, how='left')
+
+        # 3️⃣ Target columns, assembled once
+        out = pd.DataFrame(
+            {
+                col: supplied[col] if rule is None else rule[1](df[rule[0]], df)
+                for col, rule in columns.items()
+            },
+            index=df.index
+        )
+        if latest_by:
+            key, order = latest_by
+            out = out.sort_values(order).drop_duplicates(subset=[key], keep='last')
+        return out
+
+    return build
+
+
+def apply_mapping(target, frames, rows=None, supplied=None):
+    """
+    Build a target table from its source frames with its compiled mapping.
+    """
+    return compile_mapping(target)(frames, rows=rows, supplied=supplied)
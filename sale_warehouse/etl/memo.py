@@ -0,0 +1,253 @@
+# memo.py
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+from config import *
+
+# Guards the cache index: transform stages run on several threads
+_index_lock = threading.Lock()
+INDEX_FILE = os.path.join(STAGE_CACHE_DIR, "index.json")
+
+
+def stage_cache_available():
+    """
+    Stage outputs are stored as Parquet files and need the optional pyarrow package.
+    """
+    if not STAGE_CACHE_ENABLED:
+        return False
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ----------------------------
+# Input fingerprints
+# ----------------------------
+def frame_fingerprint(df, h=None):
+    """
+    Feed a DataFrame (values, index, column names and dtypes) into a sha256
+    hash, vectorized with pd.util.hash_pandas_object.
+    """
+    h = h or hashlib.sha256()
+    if df is None:
+        h.update(b"<none>")
+        return h
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    h.update(len(df).to_bytes(8, "little"))
+    if len(df.columns) > 0:
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h
+
+
+def _code_version():
+    """
+    Hash of the etl sources: a code change invalidates every cached output.
+    """
+    h = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.py"))):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def run_params():
+    """
+    Settings every transform output depends on besides its input frames:
+    the load date (effective / end / created dates), the calendar bounds and
+    the dtype policy.
+    """
+    return {
+        "today": pd.Timestamp.today().normalize().isoformat(),
+        "calendar": [str(CALENDAR_START), str(CALENDAR_END)],
+        "compact_dtypes": COMPACT_DTYPES,
+    }
+
+
+def stage_key(stage, inputs, params=None):
+    """
+    Cache key of one stage call: the stage name, its input frames (a frame,
+    a dict of frames or a list of either), its parameters, run_params() and
+    the code version.
+    """
+    h = hashlib.sha256(stage.encode())
+    h.update(json.dumps(dict(run_params(), **(params or {})), sort_keys=True, default=str).encode())
+    h.update(_code_version().encode())
+
+    def feed(value):
+        if isinstance(value, dict):
+            for name in sorted(value):
+                h.update(str(name).encode())
+                feed(value[name])
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                feed(item)
+        else:
+            frame_fingerprint(value, h)
+
+    feed(inputs)
+    return f"{stage}-{h.hexdigest()[:24]}"
+
+
+# ----------------------------
+# Cache index
+# ----------------------------
+def _load_index():
+    if os.path.exists(INDEX_FILE):
+        try:
+            with open(INDEX_FILE, "r") as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except json.JSONDecodeError:
+            return {}
+    return {}
+
+
+def _save_index(index):
+    os.makedirs(STAGE_CACHE_DIR, exist_ok=True)
+    tmp_file = INDEX_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_file, INDEX_FILE)
+
+
+def _part_file(key, i):
+    return os.path.join(STAGE_CACHE_DIR, f"{key}.{i}.parquet")
+
+
+# ----------------------------
+# Read / write
+# ----------------------------
+def load_output(key):
+    """
+    Cached output of a stage call, or None on a miss. Outputs are a frame or
+    a tuple of frames / None, stored one Parquet file per frame.
+    """
+    import pyarrow.parquet as pq
+    from .dtypes import compact_frame
+
+    with _index_lock:
+        index = _load_index()
+        entry = index.get("entries", {}).get(key)
+        hit = entry is not None and all(
+            part is None or os.path.exists(_part_file(key, i)) for i, part in enumerate(entry["parts"])
+        )
+        if not hit:
+            return None
+        entry["last_used"] = time.time()
+        _save_index(index)
+
+    # Parquet keeps only the categories in use: compacting again restores fixed ones (current_flag)
+    frames = tuple(
+        None if part is None else compact_frame(pq.read_table(_part_file(key, i), memory_map=True).to_pandas())
+        for i, part in enumerate(entry["parts"])
+    )
+    return frames if entry["tuple"] else frames[0]
+
+
+def store_output(key, output):
+    """
+    Write a stage output to the cache and evict least recently used entries
+    beyond STAGE_CACHE_MAX_MB.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frames = output if isinstance(output, tuple) else (output,)
+    os.makedirs(STAGE_CACHE_DIR, exist_ok=True)
+    parts, size = [], 0
+    for i, df in enumerate(frames):
+        if df is None:
+            parts.append(None)
+            continue
+        # Object columns holding timestamps or mixed values cannot be written as is
+        pq.write_table(pa.Table.from_pandas(df), _part_file(key, i))
+        parts.append(len(df))
+        size += os.path.getsize(_part_file(key, i))
+
+    with _index_lock:
+        index = _load_index()
+        index.setdefault("entries", {})[key] = {
+            "parts": parts,
+            "tuple": isinstance(output, tuple),
+            "bytes": size,
+            "last_used": time.time(),
+        }
+        evict(index)
+        _save_index(index)
+
+
+def evict(index, max_mb=None):
+    """
+    Drop least recently used cache entries until the cache fits under the cap.
+    """
+    max_bytes = (max_mb if max_mb is not None else STAGE_CACHE_MAX_MB) * 1024 * 1024
+    entries = index.get("entries", {})
+    total = sum(e["bytes"] for e in entries.values())
+
+    for key, entry in sorted(entries.items(), key=lambda kv: kv[1]["last_used"]):
+        if total <= max_bytes:
+            break
+        for i in range(len(entry["parts"])):
+            if os.path.exists(_part_file(key, i)):
+                os.remove(_part_file(key, i))
+        total -= entry["bytes"]
+        del entries[key]
+        logging.info(f"Evicted {key} from stage cache")
+
+
+# ----------------------------
+# Memoized stages
+# ----------------------------
+def cached_stage(stage, func, inputs, params=None, sk_columns=None):
+    """
+    Memoize a transform stage on its inputs: the inputs are fingerprinted
+    before func runs (transforms modify their input frames), a hit returns
+    the stored output without running func.
+
+    Args:
+        inputs: frames the stage reads (a frame, a dict or a list of them)
+        params: JSON-serializable values the output depends on besides the
+            inputs and run_params()
+        sk_columns: dict table -> surrogate key column allocated by the stage;
+            on a hit the key allocator is moved past the cached keys
+
+    Returns:
+        the stage output
+    """
+    if not stage_cache_available():
+        return func()
+
+    start = time.perf_counter()
+    key = stage_key(stage, inputs, params)
+    try:
+        output = load_output(key)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable stage cache entry {key}: {e}")
+        output = None
+
+    if output is not None:
+        from .keys import reserve_keys_through
+
+        frames = output if isinstance(output, tuple) else (output,)
+        for table, col in (sk_columns or {}).items():
+            keys = [df[col].max() for df in frames if df is not None and col in df.columns and len(df) > 0]
+            keys = [int(k) for k in keys if not pd.isna(k)]
+            if keys:
+                reserve_keys_through(table, max(keys))
+        logging.info(f"Stage cache hit for {stage} ({key}) in {time.perf_counter() - start:.3f}s")
+        return output
+
+    output = func()
+    try:
+        store_output(key, output)
+    except Exception as e:
+        logging.warning(f"Could not cache the output of {stage}: {e}")
+    return output
@@ -0,0 +1,283 @@
+# metrics.py
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from config import *
+
+# ----------------------------
+# Run state (one run at a time per process)
+# ----------------------------
+_run = None
+_run_lock = threading.Lock()
+_run_profiles = []  # cProfile captures of the stages of the current run (METRICS_PROFILE)
+_round_trips = threading.local()
+_total_round_trips = 0
+_total_lock = threading.Lock()
+_profiling = threading.local()
+_listener_installed = False
+
+
+def _count_round_trip(conn, cursor, statement, parameters, context, executemany):
+    global _total_round_trips
+    _round_trips.count = getattr(_round_trips, "count", 0) + 1
+    with _total_lock:
+        _total_round_trips += 1
+
+
+def _install_listener():
+    """
+    Count every statement sent to any SQLAlchemy engine, per thread.
+    """
+    global _listener_installed
+    if _listener_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, "before_cursor_execute", _count_round_trip)
+    _listener_installed = True
+
+
+def round_trips():
+    """
+    Statements executed so far by the calling thread.
+    """
+    return getattr(_round_trips, "count", 0)
+
+
+def total_round_trips():
+    """
+    Statements executed so far by every thread of the process.
+    """
+    with _total_lock:
+        return _total_round_trips
+
+
+# ----------------------------
+# Profiling
+# ----------------------------
+@contextmanager
+def _stage_profile():
+    """
+    cProfile the calling thread while a stage runs (METRICS_PROFILE) and keep
+    the capture for the run's profile. A profiler only sees the thread that
+    enabled it, so each stage is profiled on the pool thread running it;
+    stages nested in a profiled stage are part of its capture.
+    """
+    if not METRICS_PROFILE or _run is None or getattr(_profiling, "active", False):
+        yield
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:  # another profiler is active on this interpreter
+        logging.warning(f"Stage not profiled: {e}")
+        yield
+        return
+    _profiling.active = True
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profiling.active = False
+        with _run_lock:
+            _run_profiles.append(profiler)
+
+
+# ----------------------------
+# Memory
+# ----------------------------
+def current_rss_mb():
+    """
+    Resident set size of the process in MB (psutil, else /proc), None when unknown.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _RssSampler:
+    """
+    Background thread tracking the peak RSS while a stage runs.
+    """
+
+    def __init__(self, interval=METRICS_RSS_INTERVAL):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        if self.peak is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+
+# ----------------------------
+# Stages
+# ----------------------------
+def row_count(*frames):
+    """
+    Total rows of the given DataFrames (None entries are skipped).
+    """
+    return sum(len(df) for df in frames if df is not None)
+
+
+@contextmanager
+def stage_metrics(name, rows_in=None):
+    """
+    Measure one pipeline stage: wall time, CPU time of the thread running it
+    (stages running concurrently, and pools the stage starts itself, are
+    not counted), rows
+    in/out, rows per second, peak RSS and database round-trips (statements
+    sent by this thread; an executemany batch counts once). Set `rows_out` on
+    the yielded record inside the block.
+
+    Usage:
+        with stage_metrics("transform_fact_sales", rows_in=len(sales)) as m:
+            fact_sales = transform_fact_sales(...)
+            m["rows_out"] = len(fact_sales)
+    """
+    record = {"stage": name, "rows_in": rows_in, "rows_out": None}
+    if not METRICS_ENABLED:
+        yield record
+        return
+
+    _install_listener()
+    trips_before = round_trips()
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    status = "failed"
+    try:
+        with _RssSampler() as sampler, _stage_profile():
+            yield record
+        status = "success"
+    finally:
+        wall = time.perf_counter() - wall_start
+        rows = record["rows_out"] if record["rows_out"] is not None else record["rows_in"]
+        record.update({
+            "status": status,
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(time.thread_time() - cpu_start, 6),
+            "rows_per_second": round(rows / wall, 1) if rows and wall > 0 else None,
+            "peak_rss_mb": round(sampler.peak, 1) if sampler.peak is not None else None,
+            "db_round_trips": round_trips() - trips_before,
+        })
+        with _run_lock:
+            if _run is not None:
+                _run["stages"].append(record)
+        logging.info(
+            f"Stage {name}: {wall:.3f}s wall, {record['cpu_seconds']:.3f}s cpu, "
+            f"rows {record['rows_in']} -> {record['rows_out']}, "
+            f"peak RSS {record['peak_rss_mb']} MB, {record['db_round_trips']} DB round-trips"
+        )
+
+
+# ----------------------------
+# Runs
+# ----------------------------
+def annotate_run(key, value):
+    """
+    Attach extra information (e.g. the critical path) to the current run's metrics.
+    """
+    with _run_lock:
+        if _run is not None:
+            _run[key] = value
+
+
+def track_run(func):
+    """
+    Decorator for a pipeline entry point: collects the stages measured during
+    the call and writes them as one JSON document to METRICS_DIR, with an
+    optional cProfile capture of every stage, merged across the threads the
+    stages ran on (METRICS_PROFILE). Run totals cover the whole process:
+    CPU time of all threads, round-trips of all connections.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _run
+        if not METRICS_ENABLED:
+            return func(*args, **kwargs)
+
+        _install_listener()
+        run_id = pd.Timestamp.now().strftime("%Y%m%dT%H%M%S%f")
+        _run = {"run_id": run_id, "entry_point": func.__name__, "started": pd.Timestamp.now().isoformat(), "stages": []}
+        _run_profiles.clear()
+
+        trips_before = total_round_trips()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        status = "failed"
+        try:
+            with _RssSampler() as sampler:
+                result = func(*args, **kwargs)
+            status = "success"
+            return result
+        finally:
+            with _run_lock:
+                run, _run = _run, None
+                profiles = list(_run_profiles)
+                _run_profiles.clear()
+            run.update({
+                "finished": pd.Timestamp.now().isoformat(),
+                "status": status,
+                "wall_seconds": round(time.perf_counter() - wall_start, 6),
+                "cpu_seconds": round(time.process_time() - cpu_start, 6),
+                "peak_rss_mb": round(sampler.peak, 1) if sampler.peak is not None else None,
+                "db_round_trips": total_round_trips() - trips_before,
+            })
+            write_run_metrics(run, profiles)
+
+    return wrapper
+
+
+def write_run_metrics(run, profiles=None):
+    """
+    Write run-<run_id>.json (and run-<run_id>.prof, the stage profiles
+    merged) to METRICS_DIR.
+
+    Returns:
+        path of the JSON file
+    """
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    base = os.path.join(METRICS_DIR, f"run-{run['run_id']}")
+    if profiles:
+        import pstats
+
+        stats = pstats.Stats(profiles[0])
+        for profiler in profiles[1:]:
+            stats.add(profiler)
+        stats.dump_stats(base + ".prof")
+        run["profile"] = base + ".prof"
+    with open(base + ".json", "w") as f:
+        json.dump(run, f, indent=2)
+    logging.info(f"Run metrics written to {base}.json ({run['status']}, {run['wall_seconds']:.3f}s)")
+    return base + ".json"
@@ -0,0 +1,132 @@
+# scd.py
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype, is_bool_dtype
+
+# Fixed hash used for missing values so that NaN / None / NaT all compare equal
+_MISSING_HASH = np.uint64(0x9E3779B97F4A7C15)
+_HASH_MULTIPLIER = np.uint64(1000003)
+
+
+# ----------------------------
+# Column normalization
+# ----------------------------
+def _normalize_text(s):
+    """
+    Strip and upper-case string cells, leave every other value untouched.
+    """
+    s = s.astype(object)
+    is_str = s.map(type).eq(str).to_numpy()
+    if is_str.any():
+        s = s.copy()
+        s[is_str] = s[is_str].str.strip().str.upper()
+    return s
+
+
+def normalize_column_pair(col, new, old):
+    """
+    Normalize the new and old version of one tracked column to a shared dtype,
+    once per column instead of once per cell.
+
+    - columns with 'date' in the name are parsed with pd.to_datetime and
+      cast to microseconds (snapshot/Parquet frames come back as [us], parsed
+      ones as [s] or [ns], and each unit hashes differently; [ns] cannot hold
+      the far-future dates of the sources)
+    - numeric columns (on both sides) are compared as float
+    - everything else is compared as stripped, upper-cased text
+
+    Returns:
+        (new, old) normalized Series
+    """
+    if 'date' in col.lower():
+        return (
+            pd.to_datetime(new, errors='coerce').astype('datetime64[us]'),
+            pd.to_datetime(old, errors='coerce').astype('datetime64[us]')
+        )
+
+    new_numeric = is_numeric_dtype(new) and not is_bool_dtype(new)
+    old_numeric = is_numeric_dtype(old) and not is_bool_dtype(old)
+    if new_numeric and old_numeric:
+        return new.astype('float64'), old.astype('float64')
+
+    if new_numeric or old_numeric:
+        # One side came back as object (e.g. Decimal from the warehouse)
+        try:
+            return (
+                pd.to_numeric(new, errors='raise').astype('float64'),
+                pd.to_numeric(old, errors='raise').astype('float64')
+            )
+        except (ValueError, TypeError):
+            pass
+
+    return _normalize_text(new), _normalize_text(old)
+
+
+# ----------------------------
+# Row fingerprints
+# ----------------------------
+def _hash_column(s):
+    """
+    Hash a normalized column, mapping every missing value to the same hash.
+    """
+    hashed = pd.util.hash_pandas_object(s, index=False).to_numpy()
+    return np.where(s.isna().to_numpy(), _MISSING_HASH, hashed)
+
+
+def row_fingerprint(columns):
+    """
+    Combine per-column hashes into one uint64 fingerprint per row.
+
+    Args:
+        columns: list of normalized Series, all of the same length
+
+    Returns:
+        numpy uint64 array of fingerprints
+    """
+    n = len(columns[0]) if columns else 0
+    fingerprint = np.zeros(n, dtype='uint64')
+    with np.errstate(over='ignore'):
+        for s in columns:
+            fingerprint = (fingerprint * _HASH_MULTIPLIER) ^ _hash_column(s)
+    return fingerprint
+
+
+# ----------------------------
+# Change detection
+# ----------------------------
+def detect_changes(merged, tracked_cols, sk_col, suffix='_old', flag_col='current_flag'):
+    """
+    Columnar SCD Type 2 change detection.
+
+    Expects the output of merging the incoming rows with the current dimension
+    (old values carry `suffix`). A row is changed when it has no surrogate key
+    yet, or when its old version is current and any tracked column differs.
+    NaN on both sides counts as equal.
+
+    Args:
+        merged: DataFrame with new columns and `<col><suffix>` old columns
+        tracked_cols: columns that trigger a new SCD2 version
+        sk_col: surrogate key column of the old version
+        suffix: suffix used for the old columns in the merge
+        flag_col: current flag column name (without suffix)
+
+    Returns:
+        boolean Series aligned with merged
+    """
+    new_cols = []
+    old_cols = []
+    for c in tracked_cols:
+        new, old = normalize_column_pair(c, merged[c], merged[c + suffix])
+        new_cols.append(new)
+        old_cols.append(old)
+
+    differs = row_fingerprint(new_cols) != row_fingerprint(old_cols)
+
+    is_new = merged[sk_col].isna().to_numpy()
+    old_flag = merged.get(flag_col + suffix)
+    is_current = (
+        old_flag.eq('Y').to_numpy() if old_flag is not None
+        else np.ones(len(merged), dtype=bool)
+    )
+
+    return pd.Series(is_new | (is_current & differs), index=merged.index)
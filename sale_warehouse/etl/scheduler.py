@@ -0,0 +1,154 @@
+# scheduler.py
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from config import *
+
+
+# ----------------------------
+# Graph checks
+# ----------------------------
+def topological_order(tasks):
+    """
+    Task names in dependency order.
+
+    Raises:
+        ValueError: on an unknown dependency or a cycle
+    """
+    for name, task in tasks.items():
+        for dep in task.get("deps", []):
+            if dep not in tasks:
+                raise ValueError(f"Task {name} depends on unknown task {dep}")
+
+    order, state = [], {}
+
+    def visit(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+        state[name] = "visiting"
+        for dep in tasks[name].get("deps", []):
+            visit(dep, path + [name])
+        state[name] = "done"
+        order.append(name)
+
+    for name in tasks:
+        visit(name, [])
+    return order
+
+
+# ----------------------------
+# Execution
+# ----------------------------
+def run_graph(tasks, max_workers=None, limits=None):
+    """
+    Run a task graph on a thread pool, each task as soon as its dependencies
+    have finished.
+
+    Args:
+        tasks: dict name -> {"func": callable(results), "deps": [names],
+            "resource": optional name of a limited resource}
+            `results` holds the return values of the finished tasks.
+        max_workers: concurrent tasks (PIPELINE_WORKERS by default)
+        limits: dict resource -> max concurrent tasks using it (None = unlimited)
+
+    Returns:
+        results: dict name -> return value
+        timings: dict name -> (start, end) in perf_counter seconds
+
+    The first failing task stops the scheduling of new tasks; running tasks
+    finish and the exception is re-raised.
+    """
+    topological_order(tasks)
+    max_workers = max_workers or PIPELINE_WORKERS
+    limits = limits or {}
+
+    results, timings = {}, {}
+    pending = set(tasks)
+    running = {}  # future -> name
+    in_use = {}  # resource -> running tasks
+    error = None
+
+    def timed(name):
+        start = time.perf_counter()
+        try:
+            return tasks[name]["func"](results)
+        finally:
+            timings[name] = (start, time.perf_counter())
+
+    def can_start(name):
+        task = tasks[name]
+        if any(dep not in results for dep in task.get("deps", [])):
+            return False
+        resource = task.get("resource")
+        limit = limits.get(resource)
+        return resource is None or limit is None or in_use.get(resource, 0) < limit
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            if error is None:
+                for name in sorted(pending):
+                    if len(running) >= max_workers:
+                        break
+                    if can_start(name):
+                        pending.discard(name)
+                        resource = tasks[name].get("resource")
+                        in_use[resource] = in_use.get(resource, 0) + 1
+                        running[pool.submit(timed, name)] = name
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                resource = tasks[name].get("resource")
+                in_use[resource] -= 1
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logging.error(f"Task {name} failed: {e}")
+                    error = error or e
+
+    if error is not None:
+        raise error
+    return results, timings
+
+
+# ----------------------------
+# Critical path
+# ----------------------------
+def critical_path(tasks, timings):
+    """
+    Chain of tasks that determined the run time: starting from the task that
+    finished last, repeatedly follow the dependency that finished last.
+
+    Returns:
+        list of (name, seconds) from the first task to the last
+    """
+    if not timings:
+        return []
+    name = max(timings, key=lambda n: timings[n][1])
+    path = []
+    while name is not None:
+        start, end = timings[name]
+        path.append((name, end - start))
+        deps = [d for d in tasks[name].get("deps", []) if d in timings]
+        name = max(deps, key=lambda d: timings[d][1]) if deps else None
+    return path[::-1]
+
+
+def log_critical_path(tasks, timings):
+    """
+    Log the critical path of a finished graph and return it as a list of dicts.
+    """
+    path = critical_path(tasks, timings)
+    if not path:
+        return []
+    wall = max(end for _, end in timings.values()) - min(start for start, _ in timings.values())
+    busy = sum(seconds for _, seconds in path)
+    chain = " -> ".join(f"{name} ({seconds:.3f}s)" for name, seconds in path)
+    logging.info(f"Critical path: {chain} = {busy:.3f}s of {wall:.3f}s wall")
+    return [{"stage": name, "seconds": round(seconds, 6)} for name, seconds in path]
@@ -0,0 +1,87 @@
+# schemas.py
+from config import *
+from .dtypes import STRING, CATEGORY, INT32
+
+# ----------------------------
+# Declared source schemas
+# ----------------------------
+# path:  source file
+# dtype: column dtypes passed to the parser (no type inference)
+# dates: columns parsed once at extract time, with their format
+# keys:  business key columns (read as text, never inferred as numbers)
+# STRING / CATEGORY / INT32: compact parser dtypes of the dtype policy (see dtypes.py);
+#        integer columns use the nullable dtypes, so a blank cell is <NA> instead of a parse error
+SOURCE_SCHEMAS = {
+    "customer": {
+        "path": CUSTOMER_CSV,
+        "dtype": {"CID": STRING, "BDATE": STRING, "GEN": CATEGORY},
+        "dates": {},
+        "keys": ["CID"],
+    },
+    "customer_location": {
+        "path": CUSTOMER_LOCATION_CSV,
+        "dtype": {"CID": STRING, "CNTRY": CATEGORY},
+        "dates": {},
+        "keys": ["CID"],
+    },
+    "customer_info": {
+        "path": CUSTOMER_INFO_CSV,
+        "dtype": {
+            "cst_id": "float64",
+            "cst_key": STRING,
+            "cst_firstname": STRING,
+            "cst_lastname": STRING,
+            "cst_marital_status": CATEGORY,
+            "cst_gndr": CATEGORY,
+            "cst_create_date": "str",
+        },
+        "dates": {"cst_create_date": "%Y-%m-%d"},
+        "keys": ["cst_key"],
+    },
+    "product_categories": {
+        "path": PRODUCT_CATEGORIES_CSV,
+        "dtype": {"ID": STRING, "CAT": CATEGORY, "SUBCAT": CATEGORY, "MAINTENANCE": CATEGORY},
+        "dates": {},
+        "keys": ["ID"],
+    },
+    "product_info": {
+        "path": PRODUCT_INFO_CSV,
+        "dtype": {
+            "prd_id": "Int64",
+            "prd_key": STRING,
+            "prd_nm": STRING,
+            "prd_cost": "float64",
+            "prd_line": CATEGORY,
+            "prd_start_dt": "str",
+            "prd_end_dt": "str",
+        },
+        "dates": {"prd_start_dt": "%Y-%m-%d"},
+        "keys": ["prd_key"],
+    },
+    "sales_details": {
+        "path": SALES_DETAILS_CSV,
+        "dtype": {
+            "sls_ord_num": STRING,
+            "sls_prd_key": STRING,
+            "sls_cust_id": STRING,
+            "sls_order_dt": INT32,  # YYYYMMDD integers, mapped to date keys in transform
+            "sls_ship_dt": INT32,
+            "sls_due_dt": INT32,
+            "sls_sales": "float64",
+            "sls_quantity": INT32,
+            "sls_price": "float64",
+        },
+        "dates": {},
+        "keys": ["sls_ord_num", "sls_prd_key", "sls_cust_id"],
+    },
+}
+
+# Order of the frames returned by extract_all
+SOURCE_ORDER = [
+    "customer",
+    "customer_location",
+    "customer_info",
+    "product_categories",
+    "product_info",
+    "sales_details",
+]
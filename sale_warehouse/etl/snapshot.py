@@ -0,0 +1,178 @@
+# snapshot.py
+import json
+import logging
+import os
+
+import pandas as pd
+from config import *
+from .dtypes import compact_frame
+
+# ----------------------------
+# Columns needed from each dimension (SCD diff + fact key lookup)
+# ----------------------------
+SNAPSHOT_SPECS = {
+    DIM_CUSTOMER_TABLE: {
+        "sk_col": "customer_sk",
+        "end_col": "end_date",
+        "columns": [
+            "customer_sk", "customer_key", "first_name", "last_name", "gender",
+            "marital_status", "birth_date", "country", "current_flag"
+        ],
+    },
+    DIM_PRODUCT_TABLE: {
+        "sk_col": "product_sk",
+        "end_col": "end_date_histroy",
+        "columns": [
+            "product_sk", "product_id", "product_key", "product_name", "product_cost",
+            "product_line", "category", "subcategory", "maintenance",
+            "start_date", "end_date", "current_flag"
+        ],
+    },
+}
+
+
+# Columns of every version (current and expired) read by the as-of fact
+# lookups: surrogate key, business key, then the dates a version is valid from
+VERSION_COLUMNS = {
+    DIM_CUSTOMER_TABLE: ["customer_sk", "customer_key", "effective_date"],
+    DIM_PRODUCT_TABLE: ["product_sk", "product_key", "start_date", "effective_date"],
+}
+
+
+def _snapshot_paths(table):
+    return (
+        os.path.join(SNAPSHOT_DIR, f"{table}.pkl"),
+        os.path.join(SNAPSHOT_DIR, f"{table}.json"),
+    )
+
+
+def _read_chunks(query, engine, params=None):
+    """
+    Stream a query result in SNAPSHOT_CHUNK_SIZE chunks.
+    """
+    from sqlalchemy import text
+
+    chunks = list(pd.read_sql(text(query), engine, params=params, chunksize=SNAPSHOT_CHUNK_SIZE))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+def save_snapshot(table, df, as_of, mark=None):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    data_file, meta_file = _snapshot_paths(table)
+    df.to_pickle(data_file)
+    meta = {"as_of": as_of.strftime("%Y-%m-%d"), "rows": len(df)}
+    if mark is not None:
+        meta["mark"] = int(mark)
+    with open(meta_file, "w") as f:
+        json.dump(meta, f)
+
+
+def load_snapshot(table):
+    """
+    Returns:
+        (DataFrame, snapshot date, surrogate key high-water mark or None),
+        all None when there is no readable snapshot
+    """
+    data_file, meta_file = _snapshot_paths(table)
+    if not (os.path.exists(data_file) and os.path.exists(meta_file)):
+        return None, None, None
+    try:
+        with open(meta_file, "r") as f:
+            meta = json.load(f)
+        return pd.read_pickle(data_file), pd.to_datetime(meta["as_of"]), meta.get("mark")
+    except Exception as e:
+        logging.warning(f"Discarding unreadable snapshot of {table}: {e}")
+        return None, None, None
+
+
+def read_dim_snapshot(table, engine=None):
+    """
+    Current rows (current_flag = 'Y') of a dimension, only the needed columns.
+
+    The first read streams the full current slice from the warehouse and
+    stores the largest surrogate key as the snapshot's mark. Later reads start
+    from the local snapshot and fetch only the rows above the mark. Versions
+    are only expired by the load that inserts their replacement, so the keys
+    expired since the snapshot date are looked up only when new rows came
+    back: a rerun with no changes transfers nothing.
+    """
+    from .utils import get_engine
+
+    spec = SNAPSHOT_SPECS[table]
+    sk_col, end_col = spec["sk_col"], spec["end_col"]
+    columns = ", ".join(spec["columns"])
+    engine = engine or get_engine()
+    today = pd.to_datetime("today").normalize()
+
+    snapshot, as_of, mark = load_snapshot(table)
+
+    # Snapshots without a mark (empty dimension, older format) are re-read in full
+    if snapshot is None or mark is None:
+        df = _read_chunks(
+            f"SELECT {columns} FROM {table} WHERE current_flag = 'Y'", engine
+        )
+        mark = int(df[sk_col].max()) if not df.empty else None
+        logging.info(f"Read {len(df)} current rows of {table} (full snapshot)")
+    else:
+        inserted = _read_chunks(
+            f"SELECT {columns} FROM {table} WHERE {sk_col} > :mark", engine, params={"mark": mark}
+        )
+        expired = pd.DataFrame(columns=[sk_col])
+        if not inserted.empty:
+            expired = _read_chunks(
+                f"SELECT {sk_col} FROM {table} "
+                f"WHERE {sk_col} <= :mark AND current_flag = 'N' AND {end_col} >= :since",
+                engine,
+                params={"mark": mark, "since": as_of.to_pydatetime()}
+            )
+            df = snapshot[~snapshot[sk_col].isin(expired[sk_col])]
+            df = pd.concat([df, inserted[inserted['current_flag'] == 'Y']], ignore_index=True)
+        else:
+            df = snapshot
+        logging.info(
+            f"Refreshed {table} snapshot above {sk_col} {mark} with {len(inserted)} inserted and "
+            f"{len(expired)} expired rows ({len(df)} current rows)"
+        )
+        if not inserted.empty:
+            mark = max(mark, int(inserted[sk_col].max()))
+
+    df = compact_frame(df)
+    save_snapshot(table, df, today, mark)
+    return df.copy()
+
+
+def read_dim_versions(table, engine=None):
+    """
+    Every version of a dimension (current and expired), only VERSION_COLUMNS.
+
+    Those columns never change once a row is written (expiring a version only
+    sets its end date), so after the first full read only the rows above the
+    largest surrogate key of the local snapshot are fetched.
+    """
+    from .utils import get_engine
+
+    columns = VERSION_COLUMNS[table]
+    sk_col = columns[0]
+    engine = engine or get_engine()
+    name = f"{table}_versions"
+
+    snapshot, _, _ = load_snapshot(name)
+    if snapshot is None or snapshot.empty:
+        df = _read_chunks(f"SELECT {', '.join(columns)} FROM {table}", engine)
+        logging.info(f"Read {len(df)} versions of {table} (full snapshot)")
+    else:
+        mark = int(snapshot[sk_col].max())
+        delta = _read_chunks(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {sk_col} > :mark", engine, params={"mark": mark}
+        )
+        df = pd.concat([snapshot, delta], ignore_index=True) if not delta.empty else snapshot
+        logging.info(f"Refreshed {table} versions above {sk_col} {mark} with {len(delta)} rows ({len(df)} versions)")
+
+    if df.empty:
+        df = pd.DataFrame(columns=columns)
+    # SQLite returns dates as text
+    for col in columns[2:]:
+        df[col] = pd.to_datetime(df[col]).astype('datetime64[us]')
+    df = compact_frame(df)
+    save_snapshot(name, df, pd.to_datetime("today").normalize())
+    return df.copy()
@@ -0,0 +1,173 @@
+# staging.py
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from config import *
+
+# Guards the cache index: extract_all reads sources on several threads
+_index_lock = threading.Lock()
+INDEX_FILE = os.path.join(STAGING_DIR, "index.json")
+
+
+def staging_available():
+    """
+    The staging cache stores Parquet files and needs the optional pyarrow package.
+    """
+    if not STAGING_CACHE_ENABLED:
+        return False
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ----------------------------
+# Cache index
+# ----------------------------
+def _load_index():
+    if os.path.exists(INDEX_FILE):
+        try:
+            with open(INDEX_FILE, "r") as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except json.JSONDecodeError:
+            return {}
+    return {}
+
+
+def _save_index(index):
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    tmp_file = INDEX_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_file, INDEX_FILE)
+
+
+# ----------------------------
+# Fingerprints
+# ----------------------------
+def content_hash(path, block_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_fingerprint(path, index=None):
+    """
+    Size, mtime and content hash of a source file.
+
+    The content hash is reused from the index while size and mtime are
+    unchanged, so an untouched file is never read twice.
+    """
+    stat = os.stat(path)
+    known = (index or {}).get("files", {}).get(path)
+    if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+        digest = known["hash"]
+    else:
+        digest = content_hash(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest}
+
+
+def schema_hash(schema):
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _cache_key(name, fingerprint, schema):
+    return f"{name}-{fingerprint['hash'][:16]}-{schema_hash(schema)}"
+
+
+# ----------------------------
+# Read / write
+# ----------------------------
+def load_cached(name, schema):
+    """
+    Return the cached, typed frame for a source, or None on a miss.
+    Parquet files are memory-mapped instead of re-parsing the CSV text.
+    """
+    if not staging_available() or not os.path.exists(schema["path"]):
+        return None
+
+    import pyarrow.parquet as pq
+
+    with _index_lock:
+        index = _load_index()
+    # Hash outside the lock so sources are fingerprinted in parallel
+    fingerprint = file_fingerprint(schema["path"], index)
+    key = _cache_key(name, fingerprint, schema)
+    cache_file = os.path.join(STAGING_DIR, f"{key}.parquet")
+
+    with _index_lock:
+        index = _load_index()
+        index.setdefault("files", {})[schema["path"]] = fingerprint
+        entry = index.get("entries", {}).get(key)
+        hit = entry is not None and os.path.exists(cache_file)
+        if hit:
+            entry["last_used"] = time.time()
+        _save_index(index)
+
+    if not hit:
+        return None
+
+    df = pq.read_table(cache_file, memory_map=True).to_pandas()
+    logging.info(f"Staging cache hit for {name} ({cache_file})")
+    return df
+
+
+def store(name, schema, df):
+    """
+    Write a parsed source to the cache and evict least recently used
+    entries beyond STAGING_CACHE_MAX_MB.
+    """
+    if not staging_available() or df.empty:
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with _index_lock:
+        index = _load_index()
+    fingerprint = file_fingerprint(schema["path"], index)
+    key = _cache_key(name, fingerprint, schema)
+    cache_file = os.path.join(STAGING_DIR, f"{key}.parquet")
+
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), cache_file)
+
+    with _index_lock:
+        index = _load_index()
+        index.setdefault("files", {})[schema["path"]] = fingerprint
+        index.setdefault("entries", {})[key] = {
+            "source": name,
+            "bytes": os.path.getsize(cache_file),
+            "last_used": time.time(),
+        }
+        evict(index)
+        _save_index(index)
+
+    logging.info(f"Staged {name} into {cache_file}")
+
+
+def evict(index, max_mb=None):
+    """
+    Drop least recently used cache entries until the cache fits under the cap.
+    """
+    max_bytes = (max_mb if max_mb is not None else STAGING_CACHE_MAX_MB) * 1024 * 1024
+    entries = index.get("entries", {})
+    total = sum(e["bytes"] for e in entries.values())
+
+    for key, entry in sorted(entries.items(), key=lambda kv: kv[1]["last_used"]):
+        if total <= max_bytes:
+            break
+        cache_file = os.path.join(STAGING_DIR, f"{key}.parquet")
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        total -= entry["bytes"]
+        del entries[key]
+        logging.info(f"Evicted {key} from staging cache")
@@ -0,0 +1,44 @@
+# stream.py
+import logging
+
+from config import *
+from .extract import read_csv_chunks, estimate_chunk_size
+from .schemas import SOURCE_SCHEMAS
+from .transform import build_fact_lookups, transform_fact_sales
+from .load import load_fact_sales_chunks
+from .incremental import get_fact_hwm, select_new_sales
+
+SALES_DTYPES = SOURCE_SCHEMAS['sales_details']['dtype']
+
+
+def get_fact_chunk_size():
+    if FACT_CHUNK_SIZE:
+        return FACT_CHUNK_SIZE
+    chunksize = estimate_chunk_size(SALES_DETAILS_CSV, FACT_MEMORY_LIMIT_MB, dtype=SALES_DTYPES)
+    logging.info(f"Fact chunk size {chunksize} rows for a {FACT_MEMORY_LIMIT_MB} MB ceiling")
+    return chunksize
+
+
+def stream_fact_sales(dim_customer, dim_product, chunksize=None):
+    """
+    Extract, transform and load fact_sales chunk by chunk.
+
+    Dimension lookups are built once and shared by every chunk, so peak memory
+    is bounded by the chunk size instead of the size of sales_details.csv.
+    Only rows past the fact high-water mark are transformed and loaded.
+
+    Returns:
+        number of rows inserted
+    """
+    chunksize = chunksize or get_fact_chunk_size()
+    lookups = build_fact_lookups(dim_customer, dim_product)
+
+    hwm = get_fact_hwm()
+
+    def transformed_chunks():
+        for chunk in read_csv_chunks(SALES_DETAILS_CSV, chunksize, dtype=SALES_DTYPES):
+            chunk = select_new_sales(chunk, hwm)
+            if not chunk.empty:
+                yield transform_fact_sales(chunk, lookups=lookups)
+
+    return load_fact_sales_chunks(transformed_chunks())
@@ -1,9 +1,14 @@
 # transform.py
+import numpy as np
 import pandas as pd
 from .utils import generate_sk, logging
-
-import pandas as pd
-import logging
+from .scd import detect_changes
+from .keys import to_integer_sk
+from .lookup import get_key_index, resolve_keys_at, LATEST_DAY
+from .dates import generate_calendar, date_key_days
+from .dtypes import compact_frame
+from .mapping import apply_mapping
+from config import *
 
 def transform_dim_customer(customer, customer_loc, customer_info, dim_customer_current=None):
     """
@@ -13,52 +18,22 @@ def transform_dim_customer(customer, customer_loc, customer_info, dim_customer_c
     Returns:
         df_new: new or changed rows with new surrogate keys
         dim_customer_current: updated existing dimension with expired rows marked
+            (rows expired in this run carry expired == True)
     """
-    import pandas as pd
-    import logging
-
-    # -----------------------------
-    # 1️⃣ Clean and standardize keys
-    # -----------------------------
-    customer_loc['CID'] = customer_loc['CID'].astype(str).str.replace('-', '', regex=False)
-    customer_info['cst_key'] = customer_info['cst_key'].astype(str).str.strip()
-    customer['CID'] = customer['CID'].astype(str).str.strip()
-
     # -----------------------------
-    # 2️⃣ Merge sources
+    # 1️⃣ Map the sources: clean keys, merge, standardize fields, cap future
+    #    dates, latest row per customer (see mapping.py)
     # -----------------------------
-    df = customer_info.merge(customer, left_on='cst_key', right_on='CID', how='left')
-    df = df.merge(customer_loc, left_on='cst_key', right_on='CID', how='left')
-    # -----------------------------
-    # 3️⃣ Standardize fields
-    # -----------------------------
-    df['first_name'] = df['cst_firstname'].str.strip()
-    df['last_name'] = df['cst_lastname'].str.strip()
-    df['gender'] = df['cst_gndr'].str.upper()
-    df['marital_status'] = df['cst_marital_status'].str.upper()
-
-    df = df.rename(columns={
-        'cst_id':'customer_id',
-        'cst_key':'customer_key',
-        'BDATE':'birth_date',
-        'CNTRY':'country',
-        'cst_create_date':'customer_create_date'
+    df = apply_mapping("dim_customer", {
+        "customer": customer,
+        "customer_location": customer_loc,
+        "customer_info": customer_info,
     })
 
-    df = df[['customer_id','customer_key','first_name','last_name','gender',
-             'marital_status','birth_date','country','customer_create_date']]
-    
     # -----------------------------
-    # 4️⃣ Convert to datetime and fix future dates
+    # 2️⃣ Apply SCD Type 2
     # -----------------------------
-    df['customer_create_date'] = pd.to_datetime(df['customer_create_date'], errors='coerce')
     today = pd.to_datetime("today").normalize()
-    df.loc[df['customer_create_date'] > today, 'customer_create_date'] = today
-
-    df = df.sort_values('customer_create_date').drop_duplicates(subset=['customer_key'], keep='last')
-    # -----------------------------
-    # 5️⃣ Apply SCD Type 2
-    # -----------------------------
     df['effective_date'] = today
     df['end_date'] = pd.NaT
     df['current_flag'] = 'Y'
@@ -71,71 +46,29 @@ def transform_dim_customer(customer, customer_loc, customer_info, dim_customer_c
             dim_customer_current[['customer_sk','customer_key'] + tracked_cols + ['current_flag']],
             on='customer_key', how='left', suffixes=('','_old')
         )
-        # Row-wise change detection
-        def is_changed(row):
-            if pd.isna(row['customer_sk']):
-                return True
-            if row['current_flag_old'] != 'Y':
-                return False
-            for c in tracked_cols:
-                old_val = row.get(c + '_old')
-                new_val = row.get(c)
-
-                # Normalize strings: strip and upper
-                if isinstance(old_val, str):
-                    old_val = old_val.strip().upper()
-                if isinstance(new_val, str):
-                    new_val = new_val.strip().upper()
-
-                # Normalize datetimes: convert to datetime
-                if 'date' in c.lower():
-                    old_val = pd.to_datetime(old_val, errors='coerce')
-                    new_val = pd.to_datetime(new_val, errors='coerce')
-
-                # Compare NaNs as equal
-                if pd.isna(old_val) and pd.isna(new_val):
-                    continue
-                if old_val != new_val:
-                    return True
-            return False
-
-        merged['is_changed'] = merged.apply(is_changed, axis=1)
-        # Mark old rows as expired
+        # Columnar change detection (fingerprint of normalized tracked columns)
+        merged['is_changed'] = detect_changes(merged, tracked_cols, sk_col='customer_sk')
+        # Mark old rows as expired (flag only the rows expired in this run)
         expired_rows = merged[merged['is_changed'] & merged['customer_sk'].notna()]
-        
-        for _, row in expired_rows.iterrows():
-            sk_old = row['customer_sk']
-            dim_customer_current.loc[dim_customer_current['customer_sk'] == sk_old, 'end_date'] = today
-            dim_customer_current.loc[dim_customer_current['customer_sk'] == sk_old, 'current_flag'] = 'N'
-        
-
-        new_rows = merged[merged['is_changed'] & merged['customer_sk'].isna()]
-        merged['new'] = merged['is_changed'] & merged['customer_sk'].isna()
-
-        
-
-
-
+        expired_mask = dim_customer_current['customer_sk'].isin(expired_rows['customer_sk'])
+        dim_customer_current.loc[expired_mask, 'end_date'] = today
+        dim_customer_current.loc[expired_mask, 'current_flag'] = 'N'
+        dim_customer_current['expired'] = expired_mask
 
+        merged['new'] = merged['is_changed'] & merged['customer_sk'].isna()
         df_new = merged[merged['is_changed']].copy()
-        
-
         # Keep all original columns plus 'new'
         df_new = df_new[list(df.columns) + ['new']]
-        
-
-
     else:
         # No existing dimension → all rows are new
         df['new'] = True
         df_new = df.copy()
 
     # -----------------------------
-    # 6️⃣ Generate surrogate key for new rows
+    # 3️⃣ Generate surrogate key for new rows
     # -----------------------------
-    df_new = generate_sk(df_new, df_current=dim_customer_current, sk_col="customer_sk", prefix="CUST")
-    df_new = df_new.rename(columns={'sk':'customer_sk'})
-    
+    df_new = generate_sk(df_new, df_current=dim_customer_current, sk_col="customer_sk", table=DIM_CUSTOMER_TABLE)
+    df_new = compact_frame(df_new, name="dim_customer")
 
     logging.info(f"Transformed dim_customer: {len(df_new)} new/changed rows (SCD2 applied)")
     return df_new, dim_customer_current
@@ -147,72 +80,16 @@ def transform_dim_product(product_info, product_cat, dim_product_current=None):
     Returns:
         df_new: new or changed rows
         dim_product_current: updated existing dimension with expired rows
+            (rows expired in this run carry expired == True)
     """
-    import pandas as pd
-    import logging
-
     # -----------------------------
-    # 1️ Derive category key
+    # 1️⃣ Map the sources: category key, end date from the next start date
+    #    per product, merge, standardize fields (see mapping.py)
     # -----------------------------
-    product_info['cat_id'] = (
-        product_info['prd_key']
-        .astype(str)
-        .str.split('-', n=2)
-        .str[:2]
-        .str.join('_')
-    )
-
-    product_info['prd_start_dt'] = pd.to_datetime(product_info['prd_start_dt'], errors='coerce') # Generate end date using next start date per product 
-    product_info = product_info.sort_values(['prd_key', 'prd_start_dt']) 
-    product_info['prd_end_dt'] = product_info.groupby('prd_key')['prd_start_dt'].shift(-1)
-
-    # -----------------------------
-    # 2Merge sources
-    # -----------------------------
-    df = product_info.merge(
-        product_cat,
-        left_on='cat_id',
-        right_on='ID',
-        how='left'
-    )
+    df = apply_mapping("dim_product", {"product_info": product_info, "product_categories": product_cat})
 
     # -----------------------------
-    # 3️⃣ Standardize fields
-    # -----------------------------
-    df['product_name'] = df['prd_nm'].str.strip()
-    df['product_line'] = df['prd_line'].str.upper()
-
-    df = df.rename(columns={
-        'prd_id': 'product_id',
-        'prd_key': 'product_key',
-        'CAT': 'category',
-        'SUBCAT': 'subcategory',
-        'MAINTENANCE': 'maintenance',
-        'prd_cost': 'product_cost',
-        'prd_start_dt': 'start_date',
-        'prd_end_dt': 'end_date'
-    })
-
-    print(df.columns)
-
-    df = df[
-        [
-            'product_id',
-            'product_key',
-            'product_name',
-            'product_cost',
-            'product_line',
-            'category',
-            'subcategory',
-            'maintenance',
-            'start_date',
-            'end_date'
-        ]
-    ]
-
-
-    # -----------------------------
-    # 4️⃣ SCD Type 2 columns
+    # 2️⃣ SCD Type 2 columns
     # -----------------------------
     today = pd.to_datetime("today").normalize()
     df['effective_date'] = today
@@ -220,7 +97,7 @@ def transform_dim_product(product_info, product_cat, dim_product_current=None):
     df['current_flag'] = 'Y'
 
     # -----------------------------
-    # 5️⃣ Apply SCD Type 2 logic
+    # 3️⃣ Apply SCD Type 2 logic
     # -----------------------------
     if dim_product_current is not None and not dim_product_current.empty:
 
@@ -246,61 +123,13 @@ def transform_dim_product(product_info, product_cat, dim_product_current=None):
 
         # merged.rename(columns={'prd_cost':'product_cost'}, inplace=True)
 
-        def is_changed(row):
-        # NEW row → always True
-            if pd.isna(row['product_sk']):
-                return True
-
-            # Skip non-current old rows
-            if row.get('current_flag_old', 'Y') != 'Y':
-                return False
-
-            for c in tracked_cols:
-                old_val = row.get(c + '_old')
-                new_val = row.get(c)
-
-                # Normalize strings
-                if isinstance(old_val, str):
-                    old_val = old_val.strip().upper()
-                if isinstance(new_val, str):
-                    new_val = new_val.strip().upper()
-
-                # Normalize numbers
-                if isinstance(old_val, (int, float)) and isinstance(new_val, (int, float)):
-                    old_val = float(old_val)
-                    new_val = float(new_val)
-
-                # Normalize datetimes
-                if 'date' in c.lower():
-                    old_val = pd.to_datetime(old_val, errors='coerce')
-                    new_val = pd.to_datetime(new_val, errors='coerce')
-
-                # Compare NaNs
-                if pd.isna(old_val) and pd.isna(new_val):
-                    continue
-                if old_val != new_val:
-                    return True
-
-            return False
-
-
-        merged['is_changed'] = merged.apply(is_changed, axis=1)
+        merged['is_changed'] = detect_changes(merged, tracked_cols, sk_col='product_sk')
         # Expire old rows
         expired = merged[merged['is_changed'] & merged['product_sk'].notna()]
-        print(expired)
-        for _, row in expired.iterrows():
-            sk_old = row['product_sk']
-            
-            print(dim_product_current[dim_product_current['product_sk'] == sk_old]['end_date_histroy'])
-
-            dim_product_current.loc[
-                dim_product_current['product_sk'] == sk_old, 'end_date_histroy'
-            ] = today
-
-
-            dim_product_current.loc[
-                dim_product_current['product_sk'] == sk_old, 'current_flag'
-            ] = 'N'
+        expired_mask = dim_product_current['product_sk'].isin(expired['product_sk'])
+        dim_product_current.loc[expired_mask, 'end_date_histroy'] = today
+        dim_product_current.loc[expired_mask, 'current_flag'] = 'N'
+        dim_product_current['expired'] = expired_mask
 
         # Identify new rows
         merged['new'] = merged['is_changed'] & merged['product_sk'].isna()
@@ -314,122 +143,153 @@ def transform_dim_product(product_info, product_cat, dim_product_current=None):
         df_new = df.copy()
 
     # -----------------------------
-    # 6️⃣ Generate surrogate key
+    # 4️⃣ Generate surrogate key
     # -----------------------------
-    df_new = generate_sk(df_new, df_current=dim_product_current, sk_col="product_sk", prefix="PROD")
-    df_new = df_new.rename(columns={'sk': 'product_sk'})
+    df_new = generate_sk(df_new, df_current=dim_product_current, sk_col="product_sk", table=DIM_PRODUCT_TABLE)
+    df_new = compact_frame(df_new, name="dim_product")
 
     logging.info(f"Transformed dim_product: {len(df_new)} new/changed rows (SCD2 applied)")
     return df_new, dim_product_current
 
-def transform_dim_date(sales):
-    dates = pd.concat([sales['sls_order_dt'], sales['sls_ship_dt'], sales['sls_due_dt']]).dropna().unique()
-    df = pd.DataFrame(dates, columns=['full_date'])
-    df['full_date'] = pd.to_datetime(df['full_date'], format='%Y%m%d', errors='coerce')
-    df['day'] = df['full_date'].dt.day
-    df['month'] = df['full_date'].dt.month
-    df['month_name'] = df['full_date'].dt.month_name()
-    df['quarter'] = df['full_date'].dt.quarter
-    df['year'] = df['full_date'].dt.year
-
-    df = generate_sk(df, prefix="DATE")
-    df = df.rename(columns={'sk':'date_sk'})
+def transform_dim_date(start=None, end=None):
+    """
+    Build dim_date as a pre-generated calendar between CALENDAR_START and
+    CALENDAR_END, keyed by YYYYMMDD smart keys plus the unknown member.
+    """
+    df = compact_frame(generate_calendar(start, end), name="dim_date")
     logging.info(f"Transformed dim_date with {len(df)} rows")
     return df
 
-def transform_fact_sales(sales, dim_customer, dim_product, dim_date):
+def derive_customer_key(customer_key):
+    return pd.Series(customer_key).astype(str).str.strip()
+
+def derive_sales_product_key(product_key):
     """
-    Transform fact_sales by mapping dimension surrogate keys and date keys.
-    Handles key mismatches and ensures types are consistent.
+    Remove first two parts of SKU to match sls_prd_key.
+    'CO-RF-FR-R92B-58' -> ['CO','RF','FR','R92B','58'] -> take last 3 ['FR','R92B','58'] -> 'FR-R92B-58'
     """
+    return pd.Series(product_key).astype(str).str.strip().str.split('-').str[2:].str.join('-')
 
-    # -----------------------------
-    # 1️⃣ Standardize customer keys
-    # -----------------------------
-    sales['sls_cust_id'] = sales['sls_cust_id'].astype(str).str.strip()
-    dim_customer['customer_key'] = dim_customer['customer_key'].astype(str).str.strip()
-
-    # Add prefix if necessary (match dim_customer keys)
-    if not sales['sls_cust_id'].str.startswith('AW').all():
-        sales['sls_cust_id'] = 'AW' + sales['sls_cust_id'].str.zfill(8)
-
-    # Merge customer_sk
-    sales = sales.merge(
-        dim_customer[['customer_sk','customer_key']],
-        left_on='sls_cust_id',
-        right_on='customer_key',
-        how='left'
-    )
-
-    # -----------------------------
-    # 2️⃣ Standardize product keys
-    # -----------------------------
+def build_fact_lookups(dim_customer, dim_product):
+    """
+    Build the business key -> surrogate key indexes used by transform_fact_sales.
+    Indexes are persisted per dimension version (see lookup.py), so the derived
+    sales-side keys are only recomputed when a dimension changes.
+    Date keys need no index: they are computed from the source YYYYMMDD values.
 
-   
+    With FACT_LOOKUP_MODE "asof" and dimension frames carrying effective_date
+    (every SCD2 version, see utils.get_dim_versions), as-of indexes resolve
+    the one version valid at each order date; product versions are first
+    narrowed to the source record (product_id) whose start_date is the
+    latest on or before the order date.
 
-    sales['sls_prd_key'] = sales['sls_prd_key'].astype(str).str.strip()
+    Returns:
+        dict with 'customer' and 'product' key indexes
+    """
+    def asof(dim, valid_from=None):
+        if FACT_LOOKUP_MODE == "asof" and 'effective_date' in dim.columns:
+            return {
+                'effective': dim['effective_date'],
+                'valid_from': dim[valid_from] if valid_from in dim.columns else None,
+            }
+        return {}
+
+    return {
+        'customer': get_key_index(
+            'customer', dim_customer['customer_key'], dim_customer['customer_sk'],
+            derive_keys=derive_customer_key, **asof(dim_customer)
+        ),
+        'product': get_key_index(
+            'product', dim_product['product_key'], dim_product['product_sk'],
+            derive_keys=derive_sales_product_key, **asof(dim_product, 'start_date')
+        ),
+    }
+
+def map_fact_rows(sales, lookups, prefix_customer_keys=None):
+    """
+    Resolve customer, product and date keys of a sales frame (no surrogate
+    key yet). Used as is by the partitioned transform (see partition.py).
 
-    # Ensure string and strip spaces
-    dim_product['product_key'] = dim_product['product_key'].astype(str).str.strip()
+    Args:
+        prefix_customer_keys: add the 'AW' prefix to customer ids; None
+            decides from `sales` (pass the decision for the whole frame
+            when `sales` is one partition of it)
 
-    # Remove first two parts of SKU
-    dim_product['product_key'] = dim_product['product_key'].str.split('-').str[2:].str.join('-')
+    Returns:
+        rows: position in `sales` of every output row
+        df: fact columns without sales_sk / created_date
+    """
+    # -----------------------------
+    # 1️⃣ Standardize customer keys
+    # -----------------------------
+    cust_keys = sales['sls_cust_id'].astype(str).str.strip()
 
-# Example:
-# 'CO-RF-FR-R92B-58' -> ['CO','RF','FR','R92B','58'] -> take last 3 ['FR','R92B','58'] -> 'FR-R92B-58'
+    # Add prefix if necessary (match dim_customer keys)
+    if prefix_customer_keys is None:
+        prefix_customer_keys = not cust_keys.str.startswith('AW').all()
+    if prefix_customer_keys:
+        cust_keys = 'AW' + cust_keys.str.zfill(8)
 
+    # As-of indexes resolve the dimension version valid at the order date
+    # (rows without a valid order date get the current version)
+    order_days = None
+    if any('search' in index for index in lookups.values()):
+        days, valid = date_key_days(sales['sls_order_dt'])
+        order_days = np.where(valid, days, LATEST_DAY)
 
-    # Merge product_sk
-    sales = sales.merge(
-        dim_product[['product_sk','product_key']],
-        left_on='sls_prd_key',
-        right_on='product_key',
-        how='left'
-    )
+    rows, customer_sk = resolve_keys_at(lookups['customer'], cust_keys.to_numpy(), order_days)
 
     # -----------------------------
-    # 3️⃣ Convert dates safely
+    # 2️⃣ Standardize product keys and resolve product_sk
     # -----------------------------
-    for col in ['sls_order_dt','sls_ship_dt','sls_due_dt']:
-        sales[col] = pd.to_datetime(sales[col], format='%Y%m%d', errors='coerce')
+    prd_keys = sales['sls_prd_key'].astype(str).str.strip().to_numpy()
+    prd_rows, product_sk = resolve_keys_at(
+        lookups['product'], prd_keys[rows], None if order_days is None else order_days[rows]
+    )
+    rows, customer_sk = rows[prd_rows], customer_sk[prd_rows]
 
     # -----------------------------
-    # 4️⃣ Map date_sk from dim_date
+    # 3️⃣ Build final fact table: one gather of the mapped sales columns, smart
+    #    date keys straight from the source integers (see mapping.py)
     # -----------------------------
-    date_map = dim_date[['date_sk','full_date']]
-
-    sales = sales.merge(
-        date_map, left_on='sls_order_dt', right_on='full_date', how='left'
-    ).rename(columns={'date_sk':'order_date_sk'}).drop(columns=['full_date'])
+    df = apply_mapping(
+        "fact_sales", {"sales_details": sales}, rows=rows,
+        supplied={'customer_sk': customer_sk, 'product_sk': product_sk}
+    )
+    return rows, df
 
-    sales = sales.merge(
-        date_map, left_on='sls_ship_dt', right_on='full_date', how='left'
-    ).rename(columns={'date_sk':'ship_date_sk'}).drop(columns=['full_date'])
+def transform_fact_sales(sales, dim_customer=None, dim_product=None, lookups=None):
+    """
+    Transform fact_sales by mapping dimension surrogate keys and date keys.
+    Handles key mismatches and ensures types are consistent.
 
-    sales = sales.merge(
-        date_map, left_on='sls_due_dt', right_on='full_date', how='left'
-    ).rename(columns={'date_sk':'due_date_sk'}).drop(columns=['full_date'])
+    Customer and product keys are resolved with vectorized index lookups
+    instead of merges. With as-of lookups every sales line gets exactly one
+    version; with current-row lookups a business key matching several
+    dimension rows fans out exactly like a left merge. Date keys are the source YYYYMMDD integers
+    (unknown member when invalid or outside the calendar). Pass `lookups` from
+    build_fact_lookups to reuse them across chunks; otherwise they are built
+    from the dimension frames.
+
+    With FACT_WORKERS != 1, frames of at least FACT_PARALLEL_MIN_ROWS rows are
+    split into partitions transformed on a process pool (see partition.py);
+    the result is identical to the in-process path.
+    """
+    if lookups is None:
+        lookups = build_fact_lookups(dim_customer, dim_product)
 
-    # -----------------------------
-    # 5️⃣ Build final fact table
-    # -----------------------------
-    df = sales[[
-        'sls_ord_num',
-        'customer_sk',
-        'product_sk',
-        'order_date_sk',
-        'ship_date_sk',
-        'due_date_sk',
-        'sls_quantity',
-        'sls_price',
-        'sls_sales'
-    ]].copy()
+    if FACT_WORKERS != 1 and len(sales) >= FACT_PARALLEL_MIN_ROWS:
+        from .partition import map_fact_rows_partitioned
+        df = map_fact_rows_partitioned(sales, lookups)
+    else:
+        _, df = map_fact_rows(sales, lookups)
     df['created_date'] = pd.to_datetime("today").normalize()
 
     # -----------------------------
-    # 6️⃣ Generate surrogate key for fact_sales
+    # 4️⃣ Generate surrogate key for fact_sales (in row order, after any partitioning)
     # -----------------------------
-    df = generate_sk(df, prefix="SALES").rename(columns={'sk':'sales_sk'})
+    df = generate_sk(df, sk_col="sales_sk", table=FACT_SALES_TABLE)
+    df = compact_frame(df, name="fact_sales")
 
     logging.info(f"Transformed fact_sales with {len(df)} rows")
-    return df
\ No newline at end of file
+    return df
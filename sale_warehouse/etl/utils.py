@@ -1,9 +1,9 @@
 # utils.py
 import logging
 import pandas as pd
-from sqlalchemy import create_engine
 from config import *
 import os, json
+import threading
 import numpy as np
 
 
@@ -11,57 +11,86 @@ import numpy as np
 # Logging setup
 # ----------------------------
 LOG_DIR = os.path.join(os.path.dirname(__file__), "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-logging.basicConfig(
-    filename=os.path.join(LOG_DIR, "etl.log"),
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+
+def setup_logging():
+    """
+    Log to etl/logs/etl.log. Called by the entry points (main.run_etl), not at
+    import, so importing the etl package has no side effects. No-op when
+    logging is already configured.
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(LOG_DIR, "etl.log"),
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
 
 # ----------------------------
 # Surrogate key generator
 # ----------------------------
-def generate_sk(df_new, df_current=None, sk_col="sk", prefix="SK"):
+def generate_sk(df_new, df_current=None, sk_col="sk", table=None):
     """
-    Generate unique surrogate keys for new rows, dynamic for any dimension.
+    Generate unique integer surrogate keys for new rows, dynamic for any dimension.
+
+    Keys come from the persistent per-table allocator in keys.py, so the
+    existing dimension is only scanned once to seed the high-water mark.
 
     Args:
         df_new: DataFrame of new/changed rows
-        df_current: existing dimension table (to continue SK sequence)
+        df_current: existing dimension table (seeds the sequence on first use)
         sk_col: name of surrogate key column in dimension
-        prefix: optional prefix for SK
+        table: warehouse table owning the key sequence (defaults to sk_col)
 
     Returns:
         df_new with new unique surrogate key column
     """
-    df_new = df_new.copy()
-
-    # Determine starting SK
-    if df_current is not None and not df_current.empty and sk_col in df_current.columns:
-        last_sk = df_current[sk_col].apply(lambda x: int(str(x).replace(prefix, ''))).max()
-    else:
-        last_sk = 0
+    from .keys import allocate_keys, to_integer_sk
 
-    # Generate new SKs
-    new_sks = range(last_sk + 1, last_sk + 1 + len(df_new))
+    df_new = df_new.copy()
 
-    # Add prefix if needed
-    if prefix:
-        df_new[sk_col] = [f"{prefix}{x}" for x in new_sks]
-    else:
-        df_new[sk_col] = list(new_sks)
+    def current_max():
+        if df_current is not None and not df_current.empty and sk_col in df_current.columns:
+            max_sk = to_integer_sk(df_current[sk_col]).max()
+            return 0 if pd.isna(max_sk) else int(max_sk)
+        return 0
 
+    df_new[sk_col] = allocate_keys(table or sk_col, len(df_new), floor=current_max)
     return df_new
 
 # ----------------------------
 # SQLAlchemy Engine
 # ----------------------------
+_engine = None
+_engine_lock = threading.Lock()
+
 def get_engine():
-    
-    db_url = f"mssql+pyodbc://@{DB_SERVER}/{DB_NAME}?driver={DB_DRIVER.replace(' ', '+')}&trusted_connection=yes"
-   
-    engine = create_engine(db_url, fast_executemany=True)
-    return engine
+    """
+    Shared engine for the configured warehouse backend (DB_BACKEND, see
+    backend.py), created on first use. Dimension reads, key seeding and
+    loads all borrow connections from its pool (DB_POOL_* in config.py)
+    instead of opening new engines.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                from .backend import database_url, engine_options
+
+                _engine = create_engine(database_url(), **engine_options())
+    return _engine
+
+def dispose_engine():
+    """
+    Close the pooled connections and drop the shared engine; the next
+    get_engine() creates a new one (e.g. after changing DB_BACKEND or
+    deleting an embedded database file).
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
 
 # ----------------------------
 # Incremental Tracker
@@ -88,31 +117,69 @@ def save_tracker(tracker):
             tracker_serializable[k] = float(v)
         else:
             tracker_serializable[k] = v
-    with open(TRACKER_FILE, "w") as f:
+    # Write then rename, so a concurrent reader never sees a half-written file
+    tmp_file = TRACKER_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
         json.dump(tracker_serializable, f)
+    os.replace(tmp_file, TRACKER_FILE)
 
 def get_dim_customer_current():
-        """
-        Reads the current dim_customer table from SQL Server.
-        Returns a DataFrame, including historical rows.
-        """
-        query = f"SELECT * FROM {DIM_CUSTOMER_TABLE}"
-        try:
-            df = pd.read_sql(query, get_engine())
-            return df
-        except Exception as e:
-            logging.warning(f"Could not read existing dim_customer: {e}")
-            return pd.DataFrame()
-        
+    """
+    Reads the current dim_customer rows (current_flag = 'Y') from SQL Server,
+    only the columns used by the SCD diff and the fact key lookup.
+    Refreshed incrementally from a local snapshot (see snapshot.py).
+    """
+    from .snapshot import read_dim_snapshot
+    try:
+        return read_dim_snapshot(DIM_CUSTOMER_TABLE)
+    except Exception as e:
+        logging.warning(f"Could not read existing dim_customer: {e}")
+        return pd.DataFrame()
+
+def get_dim_versions(table, dim_new=None):
+    """
+    Every version (current and expired) of a dimension with the columns of
+    the as-of fact lookups (snapshot.VERSION_COLUMNS): the warehouse versions,
+    refreshed incrementally from a local snapshot, plus the new versions of
+    this run (dim_new), which are not loaded yet.
+
+    Returns:
+        DataFrame of the version columns, ordered by surrogate key
+    """
+    from .dtypes import compact_frame
+    from .keys import to_integer_sk
+    from .snapshot import read_dim_versions, VERSION_COLUMNS
+
+    columns = VERSION_COLUMNS[table]
+    sk_col = columns[0]
+    frames = []
+    try:
+        frames.append(read_dim_versions(table))
+    except Exception as e:
+        logging.warning(f"Could not read the versions of {table}: {e}")
+    if dim_new is not None and not dim_new.empty:
+        frames.append(dim_new[columns])
+
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    # Same dtypes whether the rows come from this run or from the warehouse
+    df[sk_col] = to_integer_sk(df[sk_col]).astype('int64')
+    for col in columns[2:]:
+        df[col] = pd.to_datetime(df[col]).astype('datetime64[us]')
+    df = df.drop_duplicates(subset=[sk_col], keep='last').sort_values(sk_col, kind='stable')
+    return compact_frame(df.reset_index(drop=True))
+
 def get_dim_product_current():
     """
-    Reads the current dim_product table from the database.
-    Returns a DataFrame, including historical rows.
+    Reads the current dim_product rows (current_flag = 'Y') from the database,
+    only the columns used by the SCD diff and the fact key lookup.
+    Refreshed incrementally from a local snapshot (see snapshot.py).
     """
-    query = f"SELECT * FROM {DIM_PRODUCT_TABLE}"
+    from .snapshot import read_dim_snapshot
     try:
-        df = pd.read_sql(query, get_engine())
-        return df
+        return read_dim_snapshot(DIM_PRODUCT_TABLE)
     except Exception as e:
         logging.warning(f"Could not read existing dim_product: {e}")
         return pd.DataFrame()
@@ -1,5 +1,5 @@
 # main.py
-from etl.extract import extract_all
+from etl.extract import extract_sources
 from etl.transform import (
     transform_dim_customer,
     transform_dim_product,
@@ -14,66 +14,264 @@ from etl.load import (
 )
 from etl.utils import (
     logging,
+    setup_logging,
+    get_dim_versions,
     get_dim_customer_current,
     get_dim_product_current
 )
+from etl.stream import stream_fact_sales
+from etl.manifest import SUBJECT_SOURCES, subject_changed, mark_subject_loaded
+from etl.incremental import get_fact_hwm, select_new_sales
+from etl.metrics import track_run, stage_metrics, row_count, annotate_run
+from etl.scheduler import run_graph, log_critical_path
+from etl.journal import begin_run, finish_run, checkpoint, checkpointed
+from etl.memo import cached_stage
+from etl.aggregates import refresh_aggregates
+from etl.export import export_star_schema
+from etl.keys import SK_OWNER
+from config import (
+    FACT_STREAMING, DB_BACKEND, PIPELINE_WORKERS, JOURNAL_ENABLED, AGGREGATES_ENABLED, EXPORT_ENABLED,
+    DIM_CUSTOMER_TABLE, DIM_PRODUCT_TABLE, FACT_SALES_TABLE, FACT_LOOKUP_MODE
+)
+
+def fact_dimension(table, dim_current, dim_new):
+    """
+    Dimension rows the facts are resolved against. With as-of lookups
+    (FACT_LOOKUP_MODE "asof") every SCD2 version, so each sale gets the
+    version valid at its order date. Otherwise the current rows; on a first
+    load the warehouse dimension is still empty, so the rows loaded in this
+    run are used instead.
+    """
+    if FACT_LOOKUP_MODE == "asof":
+        return get_dim_versions(table, dim_new)
+    if dim_current.empty:
+        return dim_new if dim_new is not None else dim_current
+    return dim_current[dim_current['current_flag'] == 'Y']
+
+def dimension_tasks(subject, table, read_current, transform, load, changed, fingerprint):
+    """
+    Read -> extract -> transform -> load chain of one SCD2 dimension.
+    The subject area is skipped when its sources are unchanged and the
+    warehouse dimension is not empty. The transform is memoized on its
+    sources and the current dimension rows (memo.cached_stage).
+    """
+    def read(results):
+        with stage_metrics(f"read_dim_{subject}") as m:
+            dim_current = read_current()
+            m["rows_out"] = len(dim_current)
+        return dim_current
+
+    def extract(results):
+        # An empty warehouse dimension always needs a full load
+        if not (changed or results[f"read_dim_{subject}"].empty):
+            return None
+        with stage_metrics(f"extract_{subject}") as m:
+            sources = extract_sources(SUBJECT_SOURCES[subject])
+            m["rows_out"] = row_count(*sources.values())
+        return sources
+
+    def transform_task(results):
+        dim_current = results[f"read_dim_{subject}"]
+        sources = results[f"extract_{subject}"]
+        if sources is None:
+            logging.info(f"Skipped dim_{subject}: {subject} sources unchanged")
+            return None, dim_current
+        with stage_metrics(f"transform_dim_{subject}", rows_in=row_count(*sources.values())) as m:
+            dim_new, dim_current = cached_stage(
+                f"transform_dim_{subject}", lambda: transform(sources, dim_current),
+                inputs=[sources, dim_current], sk_columns={table: SK_OWNER[table]}
+            )
+            m["rows_out"] = len(dim_new)
+        return dim_new, dim_current
+
+    def load_task(results):
+        dim_new, dim_current = results[f"transform_dim_{subject}"]
+        if dim_new is None:
+            return
+        with stage_metrics(f"load_dim_{subject}", rows_in=len(dim_new)):
+            load(dim_new, dim_current)
+        mark_subject_loaded(subject, fingerprint)
+
+    return {
+        f"read_dim_{subject}": {"func": read, "deps": []},
+        f"extract_{subject}": {"func": extract, "deps": [f"read_dim_{subject}"]},
+        f"transform_dim_{subject}": {
+            "func": transform_task, "deps": [f"read_dim_{subject}", f"extract_{subject}"]
+        },
+        f"load_dim_{subject}": {
+            "func": load_task, "deps": [f"transform_dim_{subject}"], "resource": "warehouse_write"
+        },
+    }
+
+def build_pipeline(customer_changed, customer_fingerprint, product_changed, product_fingerprint):
+    """
+    Stage graph of one run. The customer chain, the product chain and dim_date
+    are independent; facts need all three dimensions transformed, and are
+    loaded after the dimension loads. The aggregate tables are refreshed and
+    the star schema is exported to Parquet once the facts are loaded.
+
+    Returns:
+        dict name -> {"func", "deps"[, "resource"]} for scheduler.run_graph
+    """
+    tasks = {}
+    tasks.update(dimension_tasks(
+        "customer", DIM_CUSTOMER_TABLE, get_dim_customer_current,
+        lambda s, current: transform_dim_customer(
+            s["customer"], s["customer_location"], s["customer_info"], dim_customer_current=current
+        ),
+        load_dim_customer, customer_changed, customer_fingerprint
+    ))
+    tasks.update(dimension_tasks(
+        "product", DIM_PRODUCT_TABLE, get_dim_product_current,
+        lambda s, current: transform_dim_product(
+            s["product_info"], s["product_categories"], dim_product_current=current
+        ),
+        load_dim_product, product_changed, product_fingerprint
+    ))
+
+    def transform_date(results):
+        with stage_metrics("transform_dim_date") as m:
+            dim_date = cached_stage("transform_dim_date", transform_dim_date, inputs=[])
+            m["rows_out"] = len(dim_date)
+        return dim_date
+
+    def load_date(results):
+        dim_date = results["transform_dim_date"]
+        with stage_metrics("load_dim_date", rows_in=len(dim_date)):
+            load_dim_date(dim_date)
+
+    def fact_dimensions(results):
+        customer_new, customer_current = results["transform_dim_customer"]
+        product_new, product_current = results["transform_dim_product"]
+        return (
+            fact_dimension(DIM_CUSTOMER_TABLE, customer_current, customer_new),
+            fact_dimension(DIM_PRODUCT_TABLE, product_current, product_new),
+        )
+
+    def aggregates(results):
+        with stage_metrics("refresh_aggregates") as m:
+            m["rows_out"] = sum(refresh_aggregates().values())
 
+    def export(results):
+        with stage_metrics("export_parquet") as m:
+            m["rows_out"] = export_star_schema()
+
+    def add_downstream(fact_load):
+        if AGGREGATES_ENABLED:
+            tasks["refresh_aggregates"] = {
+                "func": aggregates, "deps": [fact_load], "resource": "warehouse_write"
+            }
+        if EXPORT_ENABLED:
+            tasks["export_parquet"] = {"func": export, "deps": [fact_load]}
+
+    tasks["transform_dim_date"] = {"func": transform_date, "deps": []}
+    tasks["load_dim_date"] = {"func": load_date, "deps": ["transform_dim_date"], "resource": "warehouse_write"}
+    dimension_loads = ["load_dim_customer", "load_dim_product", "load_dim_date"]
+
+    if FACT_STREAMING:
+        def stream_facts(results):
+            with stage_metrics("stream_fact_sales") as m:
+                m["rows_out"] = stream_fact_sales(*fact_dimensions(results))
+
+        tasks["stream_fact_sales"] = {
+            "func": stream_facts,
+            "deps": ["transform_dim_customer", "transform_dim_product"] + dimension_loads,
+            "resource": "warehouse_write",
+        }
+        add_downstream("stream_fact_sales")
+        return tasks
+
+    def extract_sales(results):
+        with stage_metrics("extract_sales") as m:
+            sales = extract_sources(["sales_details"])["sales_details"]
+            m["rows_out"] = len(sales)
+        return sales
+
+    def transform_facts(results):
+        sales = results["extract_sales"]
+        with stage_metrics("transform_fact_sales", rows_in=len(sales)) as m:
+            new_sales = select_new_sales(sales, get_fact_hwm())
+            dim_customer, dim_product = fact_dimensions(results)
+            # Facts only read the key columns (and the validity dates for as-of lookups): the rows
+            # just transformed and the same rows read back from the warehouse after their
+            # load are the same input
+            keys = [
+                dim[[c for c in columns if c in dim.columns]].reset_index(drop=True)
+                for dim, columns in [
+                    (dim_customer, ['customer_key', 'customer_sk', 'effective_date']),
+                    (dim_product, ['product_key', 'product_sk', 'start_date', 'effective_date']),
+                ]
+            ]
+            fact_sales = cached_stage(
+                "transform_fact_sales", lambda: transform_fact_sales(new_sales, dim_customer, dim_product),
+                inputs=[new_sales, *keys], sk_columns={FACT_SALES_TABLE: SK_OWNER[FACT_SALES_TABLE]}
+            )
+            m["rows_out"] = len(fact_sales)
+        return fact_sales
+
+    def load_facts(results):
+        fact_sales = results["transform_fact_sales"]
+        with stage_metrics("load_fact_sales", rows_in=len(fact_sales)) as m:
+            m["rows_out"] = load_fact_sales(fact_sales)
+
+    tasks["extract_sales"] = {"func": extract_sales, "deps": []}
+    tasks["transform_fact_sales"] = {
+        "func": transform_facts,
+        "deps": ["extract_sales", "transform_dim_customer", "transform_dim_product"],
+    }
+    tasks["load_fact_sales"] = {
+        "func": load_facts,
+        "deps": ["transform_fact_sales"] + dimension_loads,
+        "resource": "warehouse_write",
+    }
+    add_downstream("load_fact_sales")
+    return tasks
+
+@track_run
 def run_etl():
+    setup_logging()
     logging.info("ETL Started")
 
     # -------------------
-    # 1️⃣ Extract
+    # 0️⃣ Start a journaled run, or resume the last failed one from its completed stages
     # -------------------
-    (
-        customer,
-        customer_loc,
-        customer_info,
-        product_cat,
-        product_info,
-        sales
-    ) = extract_all()
+    run_id, done = begin_run() if JOURNAL_ENABLED else (None, {})
+    annotate_run("journal", {"run_id": run_id, "resumed_stages": sorted(done)})
 
     # -------------------
-    # 2️⃣ Read current dimensions from warehouse
+    # 1️⃣ Skip subject areas whose sources are unchanged since the last load
     # -------------------
-    dim_customer_current = get_dim_customer_current()
-    dim_product_current = get_dim_product_current()
+    # A resumed run keeps the decisions of its first attempt (the manifest has
+    # moved on for the subject areas it already loaded)
+    def check_manifest():
+        return subject_changed("customer") + subject_changed("product")
+
+    with stage_metrics("check_manifest"):
+        customer_changed, customer_fingerprint, product_changed, product_fingerprint = checkpoint(
+            run_id, done, "check_manifest", check_manifest
+        )
 
     # -------------------
-    # 3️⃣ Transform dimensions (SCD Type 2)
+    # 2️⃣ Declare the stage graph (read -> extract -> transform -> load per dimension, then facts)
     # -------------------
-    dim_customer_new, dim_customer_current = transform_dim_customer(
-        customer,
-        customer_loc,
-        customer_info,
-        dim_customer_current=dim_customer_current
-    )
-
-    dim_product_new, dim_product_current = transform_dim_product(
-        product_info,
-        product_cat,
-        dim_product_current=dim_product_current
-    )
-
-    dim_date = transform_dim_date(sales)
+    tasks = build_pipeline(customer_changed, customer_fingerprint, product_changed, product_fingerprint)
 
     # -------------------
-    # 4️⃣ Transform facts (use CURRENT dimension only)
+    # 3️⃣ Run independent branches concurrently, each stage journaled with its output
     # -------------------
-    fact_sales = transform_fact_sales(
-        sales,
-        dim_customer_current[dim_customer_current['current_flag'] == 'Y'],
-        dim_product_current[dim_product_current['current_flag'] == 'Y'],
-        dim_date
-    )
+    # Embedded warehouses take one writer at a time
+    limits = {"warehouse_write": None if DB_BACKEND == "mssql" else 1}
+    try:
+        results, timings = run_graph(checkpointed(tasks, run_id, done), max_workers=PIPELINE_WORKERS, limits=limits)
+    except Exception:
+        finish_run(run_id, "failed")
+        raise
+    finish_run(run_id, "success")
 
     # -------------------
-    # 5️⃣ Load
+    # 4️⃣ Report the critical path
     # -------------------
-    load_dim_customer(dim_customer_new, dim_customer_current)
-    load_dim_product(dim_product_new, dim_product_current)
-    load_dim_date(dim_date)
-    load_fact_sales(fact_sales)
+    annotate_run("critical_path", log_critical_path(tasks, timings))
 
     logging.info("ETL Finished Successfully")
 